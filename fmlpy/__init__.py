@@ -1,5 +1,5 @@
 __project__ = "fmlpy"
 __version__ = "0.1.1"
 
-from .preprocess import bars, feature_mat, filters, frac_diff
+from .preprocess import backend, bars, bar_stream, bar_batch, feature_mat, filters, frac_diff
 from .model import cross_val, seq_bootstrap
\ No newline at end of file
@@ -1,4 +1,8 @@
 from .bars import *
+from .bar_stream import *
+from .bar_batch import *
 from .feature_mat import *
+from .bar_features import *
 from .frac_diff import *
-from .filters import *
\ No newline at end of file
+from .filters import *
+from .backend import set_backend, get_backend
\ No newline at end of file
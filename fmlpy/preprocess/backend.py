@@ -0,0 +1,260 @@
+import warnings
+import numpy as np
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+BACKENDS = ["python", "numba"]
+_backend = "numba" if numba is not None else "python"
+_compiled = {}
+
+
+def set_backend(name):
+    """
+    choose the backend of the tick-level loops for the whole package
+    @parameters:
+    name -- string
+        "python" runs the loops in pure python
+        "numba" compiles them with numba, falls back to "python" with a
+        warning if numba is not installed
+        numba is the default when it is installed, the first call of each
+        kernel then compiles it (about 0.3-1s), later calls use the compiled
+        code, which is also cached on disk for later sessions
+    """
+    global _backend
+    _backend = _resolve(name)
+
+
+def get_backend():
+    """
+    @returns:
+    name -- string
+        backend used when a function is called with backend=None
+    """
+    return _backend
+
+
+def _resolve(name):
+    if name is None:
+        return _backend
+    if name not in BACKENDS:
+        raise ValueError("backend should be one of: " + "/".join(BACKENDS))
+    if name == "numba" and numba is None:
+        warnings.warn("numba is not installed, use python backend instead")
+        return "python"
+    return name
+
+
+def _call(kernel, backend, *args):
+    """
+    run a kernel with the given backend
+    the python backend is fed memoryviews of the arrays, which give python
+    scalars and are about as fast to index as lists in a python loop, much
+    faster than np.ndarray, without copying the input into python objects;
+    the numba backend is fed contiguous arrays
+    @parameters:
+    kernel -- function
+        one of the _*_kernel functions in this module
+    backend -- string or None
+        "python"/"numba", None means the global setting
+    args -- np.ndarray or scalar
+        arguments of the kernel
+    """
+    if _resolve(backend) == "numba":
+        if kernel not in _compiled:
+            _compiled[kernel] = numba.njit(cache=True)(kernel)
+        args = [np.ascontiguousarray(a) if isinstance(a, np.ndarray) else a for a in args]
+        return _compiled[kernel](*args)
+    args = [memoryview(np.ascontiguousarray(a)) if isinstance(a, np.ndarray) and a.ndim > 0 else a
+            for a in args]
+    return kernel(*args)
+
+
+def _tick_run_kernel(b_t, E_theta, ET_alpha, ET_len, P_alpha, P_len):
+    """
+    bar lengths of tick run bars, see bars.tick_run_bar()
+    the EMA estimators are written out inline so the loop compiles in nopython mode
+    """
+    N = len(b_t)
+    bar = np.zeros(N + 1, dtype=np.int64)
+    n_bar = 0
+    E_T, ET_n = 0.0, 0
+    P_bt1, P_n = 0.0, 0
+    pos_cnt, neg_cnt = 0, 0
+    increment = 0
+    for i in range(N):
+        if b_t[i] == 1:
+            pos_cnt += 1
+        elif b_t[i] == -1:
+            neg_cnt += 1
+        increment += 1
+
+        if max(pos_cnt, neg_cnt) >= E_theta:
+            bar[n_bar] = increment
+            n_bar += 1
+            p = pos_cnt / increment
+            if ET_n == 0:
+                E_T = increment * 1.0
+                ET_n = 1
+            elif ET_n < ET_len:
+                E_T = ET_alpha*increment + (1-ET_alpha)*E_T
+                ET_n += 1
+            if P_n == 0:
+                P_bt1 = p
+                P_n = 1
+            elif P_n < P_len:
+                P_bt1 = P_alpha*p + (1-P_alpha)*P_bt1
+                P_n += 1
+            pos_cnt, neg_cnt = 0, 0
+            increment = 0
+            E_theta = E_T * max(P_bt1, 1 - P_bt1)
+    return bar[:n_bar]
+
+
+def _imbalance_kernel(b_t, E_theta, ET_alpha, ET_len, P_alpha, P_len):
+    """
+    bar lengths of imbalance bars, see bars.imbalance_bar()
+    b_t is signed ticks for TIB or signed volume for VIB, a bar is closed when
+    the imbalance reaches E_theta, and then E[T] is updated with its length and
+    2P(b_t==1)-1 with each of its ticks; the scan stops at the first bar which
+    is as long as the rest of the series together with the bar before it, the
+    caller puts the remaining ticks into the last bar
+    """
+    N = len(b_t)
+    bar = np.zeros(N + 1, dtype=np.int64)
+    n_bar = 0
+    E_T, ET_n = 0.0, 0
+    P, P_n = 0.0, 0
+    theta = 0.0
+    increment = 0
+    for i in range(N):
+        theta += b_t[i]
+        increment += 1
+
+        if abs(theta) >= E_theta:
+            if n_bar > 0 and bar[n_bar-1] + increment >= N:
+                break
+            bar[n_bar] = increment
+            n_bar += 1
+            if ET_n == 0:
+                E_T = increment * 1.0
+                ET_n = 1
+            elif ET_n < ET_len:
+                E_T = ET_alpha*increment + (1-ET_alpha)*E_T
+                ET_n += 1
+            for k in range(i - increment + 1, i + 1):
+                if P_n >= P_len:
+                    break
+                if P_n == 0:
+                    P = b_t[k] * 1.0
+                else:
+                    P = P_alpha*b_t[k] + (1-P_alpha)*P
+                P_n += 1
+            theta = 0.0
+            increment = 0
+            E_theta = E_T * abs(P)
+    return bar[:n_bar]
+
+
+def _vol_run_kernel(b_t, vol, E_theta, P_bt1, E_v_bt_pos, E_v_bt_neg,
+                    ET_alpha, ET_len, P_alpha, P_len, pos_alpha, pos_len, neg_alpha, neg_len):
+    """
+    bar lengths of volume run bars, see bars.vol_run_bar()
+    P_bt1, E_v_bt_pos and E_v_bt_neg are the warm up values, i.e. the first
+    observation of their EMA estimators
+    """
+    N = len(b_t)
+    bar = np.zeros(N + 1, dtype=np.int64)
+    n_bar = 0
+    E_T, ET_n = 0.0, 0
+    P_n, pos_n, neg_n = 1, 1, 1
+    pos_vol, neg_vol = 0.0, 0.0
+    pos_cnt, neg_cnt = 0, 0
+    increment = 0
+    for i in range(N):
+        if b_t[i] == 1:
+            pos_vol += vol[i]
+            pos_cnt += 1
+        elif b_t[i] == -1:
+            neg_vol += vol[i]
+            neg_cnt += 1
+        increment += 1
+
+        if max(pos_vol, neg_vol) >= E_theta:
+            bar[n_bar] = increment
+            n_bar += 1
+            if ET_n == 0:
+                E_T = increment * 1.0
+                ET_n = 1
+            elif ET_n < ET_len:
+                E_T = ET_alpha*increment + (1-ET_alpha)*E_T
+                ET_n += 1
+            if P_n < P_len:
+                P_bt1 = P_alpha*(pos_cnt/increment) + (1-P_alpha)*P_bt1
+                P_n += 1
+            if pos_n < pos_len:
+                E_v_bt_pos = pos_alpha*(pos_vol/increment) + (1-pos_alpha)*E_v_bt_pos
+                pos_n += 1
+            if neg_n < neg_len:
+                E_v_bt_neg = neg_alpha*(neg_vol/increment) + (1-neg_alpha)*E_v_bt_neg
+                neg_n += 1
+            pos_cnt, neg_cnt = 0, 0
+            pos_vol, neg_vol = 0.0, 0.0
+            increment = 0
+            E_theta = E_T * max(E_v_bt_pos*P_bt1, E_v_bt_neg * (1 - P_bt1))
+    return bar[:n_bar]
+
+
+def _cumsum_kernel(price_diff, thres, S_pos, S_neg):
+    """
+    event index of the CUMSUM filter, see filters.CUMSUM_filter()
+    thres[i] is the threshold of price_diff[i], S_pos and S_neg are the sums
+    carried over from the previous chunk and are returned updated
+    """
+    N = len(price_diff)
+    CUMSUM_idx = np.zeros(N, dtype=np.int64)
+    n_event = 0
+    for i in range(1, N + 1):
+        S_pos = max(0.0, S_pos + price_diff[i-1])
+        S_neg = min(0.0, S_neg + price_diff[i-1])
+        if max(S_pos, -S_neg) >= thres[i-1]:
+            CUMSUM_idx[n_event] = i
+            n_event += 1
+            S_pos, S_neg = 0.0, 0.0
+    return CUMSUM_idx[:n_event], S_pos, S_neg
+
+
+def _cumsum_multi_kernel(price, bounds, thres):
+    """
+    events of the CUMSUM filter for every series and threshold, see
+    filters.multi_CUMSUM_filter()
+    price holds the series one after another, series i is price[bounds[i]:bounds[i+1]]
+    @returns:
+    offsets -- events of series i with thres[j] are indices[offsets[k]:offsets[k+1]],
+        k = i*len(thres) + j
+    indices -- positions within each series
+    """
+    n_series = len(bounds) - 1
+    n_thres = len(thres)
+    offsets = np.zeros(n_series * n_thres + 1, dtype=np.int64)
+    indices = np.zeros(1024, dtype=np.int64)
+    n_event = 0
+    for s in range(n_series):
+        price_diff = np.diff(price[bounds[s]:bounds[s+1]]) # shared by all thresholds
+        for j in range(n_thres):
+            if n_event + len(price_diff) > len(indices): # room for one event per tick
+                grown = np.zeros(2 * (n_event + len(price_diff)), dtype=np.int64)
+                grown[:n_event] = indices[:n_event]
+                indices = grown
+            S_pos, S_neg = 0.0, 0.0
+            for i in range(1, len(price_diff) + 1):
+                S_pos = max(0.0, S_pos + price_diff[i-1])
+                S_neg = min(0.0, S_neg + price_diff[i-1])
+                if max(S_pos, -S_neg) >= thres[j]:
+                    indices[n_event] = i
+                    n_event += 1
+                    S_pos, S_neg = 0.0, 0.0
+            offsets[s*n_thres + j + 1] = n_event
+    return offsets, indices[:n_event].copy()
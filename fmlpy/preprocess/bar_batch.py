@@ -0,0 +1,193 @@
+import time
+import warnings
+import pandas as pd
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+from . import bars
+
+BAR_FUNCTIONS = {"time": bars.time_bar, "volume": bars.volume_bar, "dollar": bars.dollar_bar,
+                 "imbalance": bars.imbalance_bar, "tick_run": bars.tick_run_bar,
+                 "vol_run": bars.vol_run_bar}
+
+
+def _symbol_columns(data, symbol_col):
+    """
+    find the ticks of each symbol in the input of multi_symbol_bars(), without copying them
+    @returns:
+    symbols -- list
+    names -- list of column names, ["time", "price"(, "vol")]
+    sources -- list of (frame, rows)
+        the columns of frame are time, price(, vol), rows is None if frame only
+        has the ticks of that symbol, otherwise the positions of the symbol in frame
+    """
+    if isinstance(data, dict):
+        symbols = list(data.keys())
+        sources = [(data[s], None) for s in symbols]
+    elif isinstance(data, pd.DataFrame):
+        ticks = data.drop(columns=[symbol_col])
+        symbols, inverse = np.unique(data[symbol_col].values, return_inverse=True)
+        # stable, so ticks of each symbol keep their order
+        order = np.argsort(inverse, kind="stable")
+        bounds = np.concatenate(([0], np.cumsum(np.bincount(inverse, minlength=len(symbols)))))
+        sources = [(ticks, order[bounds[i]:bounds[i+1]]) for i in range(len(symbols))]
+        symbols = symbols.tolist()
+    else:
+        raise TypeError("the input should be a dict of DataFrame or a long format DataFrame")
+    n_col = min([frame.shape[1] for frame, _ in sources] + [3])
+    return symbols, ["time", "price", "vol"][:n_col], sources
+
+
+def _column_values(column, name):
+    """
+    numeric values of a column, datetime-like time is turned into int64 nanoseconds
+    @returns:
+    values -- 1d np.ndarray
+    is_datetime -- binary
+    """
+    if pd.api.types.is_numeric_dtype(column):
+        return column.to_numpy(), False
+    if name == "time":
+        return pd.to_datetime(column).to_numpy().astype("datetime64[ns]").view("int64"), True
+    return pd.to_numeric(column).to_numpy(), False
+
+
+def _share(names, sources):
+    """
+    write the columns of every symbol one after another into shared memory
+    blocks, each symbol is converted and copied straight into its rows
+    @returns:
+    blocks -- list of SharedMemory
+        the caller has to close and unlink them
+    spec -- list of tuples (column, block name, dtype, length, is_datetime)
+    bounds -- 1d np.ndarray
+        ticks of symbols[i] are rows bounds[i] to bounds[i+1]-1
+    """
+    sizes = [frame.shape[0] if rows is None else len(rows) for frame, rows in sources]
+    bounds = np.concatenate(([0], np.cumsum(sizes))).astype(np.int64)
+    blocks, spec = [], []
+    try:
+        for j, name in enumerate(names):
+            # the first pass only looks at the dtypes, so no symbol is converted twice
+            kinds = [(pd.api.types.is_numeric_dtype(frame.iloc[:, j]), frame.iloc[:, j].dtype)
+                     for frame, _ in sources]
+            is_datetime = name == "time" and not all(numeric for numeric, _ in kinds)
+            if is_datetime:
+                dtype = np.dtype(np.int64)
+            elif all(numeric for numeric, _ in kinds):
+                dtype = np.result_type(*[getattr(d, "numpy_dtype", d) for _, d in kinds]) if kinds \
+                    else np.dtype(np.float64)
+            else:
+                dtype = np.dtype(np.float64)
+            block = shared_memory.SharedMemory(create=True, size=max(int(bounds[-1]) * dtype.itemsize, 1))
+            blocks.append(block)
+            out = np.ndarray((int(bounds[-1]),), dtype=dtype, buffer=block.buf)
+            whole = None # column of the long frame, converted once
+            for i, (frame, rows) in enumerate(sources):
+                if rows is None:
+                    values, _ = _column_values(frame.iloc[:, j], name)
+                    out[bounds[i]:bounds[i+1]] = values
+                else:
+                    if whole is None:
+                        whole, _ = _column_values(frame.iloc[:, j], name)
+                    np.take(whole, rows, out=out[bounds[i]:bounds[i+1]])
+            del out
+            spec.append((name, block.name, dtype.str, int(bounds[-1]), is_datetime))
+    except BaseException:
+        for block in blocks:
+            block.close()
+            block.unlink()
+        raise
+    return blocks, spec, bounds
+
+
+def _bar_worker(spec, symbol, start, end, kind, kwargs):
+    """
+    attach to the shared columns, bar the ticks of one symbol and time it
+    an error of the bar function is returned as a string, so the other
+    symbols are not lost
+    """
+    start_time = time.perf_counter()
+    blocks = [shared_memory.SharedMemory(name=name) for _, name, _, _, _ in spec]
+    try:
+        columns = {}
+        for (col, _, dtype, length, is_datetime), block in zip(spec, blocks):
+            values = np.ndarray((length,), dtype=dtype, buffer=block.buf)[start:end].copy()
+            columns[col] = values.view("datetime64[ns]") if is_datetime else values
+    finally:
+        for block in blocks:
+            block.close()
+    try:
+        res = BAR_FUNCTIONS[kind](tuple(columns.values()), **kwargs)
+    except Exception as err:
+        res = "%s: %s" % (type(err).__name__, err)
+    return symbol, res, end - start, time.perf_counter() - start_time
+
+
+def multi_symbol_bars(data, kind, symbol_col="symbol", n_jobs=1, **kwargs):
+    """
+    generate the same kind of bars for many symbols with a process pool
+    ticks of every symbol are written straight into shared memory and every
+    worker only copies the rows of the symbol it works on, instead of
+    receiving a pickled dataframe
+    a symbol whose bar function raises is left out of result with a warning,
+    and its error is kept in timings, the other symbols are still returned
+    @parameters:
+    data -- dict or dataframe
+        dict of symbol: dataframe, each dataframe is the input of the bar function
+        or a long format dataframe with a symbol column, other columns are used
+        in order as time, price(, volume)
+    kind -- string
+        one of "time"/"volume"/"dollar"/"imbalance"/"tick_run"/"vol_run"
+    symbol_col -- string
+        name of symbol column of a long format dataframe, default is "symbol"
+    n_jobs -- int
+        number of processes, default is 1 which runs in current process
+    kwargs --
+        parameters of the bar function, e.g. size for "volume", bar for "dollar"
+    @returns:
+    result -- dataframe (start_t, end_t, start_idx, end_idx, low, high, open, close)
+        indexed by (symbol, bar number), start_idx/end_idx are positions within each symbol
+        non numeric time columns are returned as datetime
+    timings -- dataframe (n_tick, n_bar, seconds, error)
+        indexed by symbol, seconds is the wall time spent on each symbol,
+        error is "ErrorType: message" for symbols that failed, None otherwise
+    """
+    if kind not in BAR_FUNCTIONS:
+        raise ValueError("kind should be one of: " + "/".join(BAR_FUNCTIONS))
+    symbols, names, sources = _symbol_columns(data, symbol_col)
+    blocks, spec, bounds = _share(names, sources)
+    del sources
+    tasks = [(spec, s, bounds[i], bounds[i+1], kind, kwargs) for i, s in enumerate(symbols)]
+    outputs = {}
+    try:
+        if n_jobs == 1:
+            for task in tasks:
+                out = _bar_worker(*task)
+                outputs[out[0]] = out
+        else:
+            with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+                futures = [pool.submit(_bar_worker, *task) for task in tasks]
+                for future in as_completed(futures):
+                    out = future.result()
+                    outputs[out[0]] = out
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+    errors = {s: outputs[s][1] for s in symbols if isinstance(outputs[s][1], str)}
+    for s, err in errors.items():
+        warnings.warn("no bars for symbol %s, %s" % (s, err))
+    done = [s for s in symbols if s not in errors]
+    if done:
+        result = pd.concat([outputs[s][1] for s in done], keys=done, names=["symbol", None])
+    else:
+        result = bars._empty_bars(np.zeros(0, dtype="datetime64[ns]"), np.zeros(0))
+        result.index = pd.MultiIndex.from_arrays([[], []], names=["symbol", None])
+    timings = pd.DataFrame({"n_tick": [outputs[s][2] for s in symbols],
+                            "n_bar": [0 if s in errors else outputs[s][1].shape[0] for s in symbols],
+                            "seconds": [outputs[s][3] for s in symbols],
+                            "error": [errors.get(s) for s in symbols]},
+                           index=pd.Index(symbols, name="symbol"))
+    return result, timings
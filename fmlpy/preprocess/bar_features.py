@@ -0,0 +1,187 @@
+import pandas as pd
+import numpy as np
+from .bars import tick_rule
+
+ROLLING_FEATURES = ["rtn", "cum_rtn", "vol", "zscore", "autocorr", "ewm_vol", "ewm_zscore",
+                    "roll_spread", "kyle_lambda", "amihud", "imbalance"]
+# features which need the volume of each tick
+_VOL_FEATURES = ["kyle_lambda", "amihud", "imbalance"]
+
+
+def _rolling_sum(x, window):
+    """
+    sum of x[k-window+1:k+1] for each k with one cumsum
+    the first window-1 elements are partial sums
+    """
+    c = np.cumsum(x)
+    res = c.copy()
+    res[window:] -= c[:-window]
+    return res
+
+
+def _rolling_moments(x, window):
+    """
+    @returns:
+    mean, std (ddof=1) of x[k-window+1:k+1] for each k
+    x is centered first so the sum of squares does not lose precision on price levels
+    """
+    shift = x[0] if len(x) else 0.0
+    x = x - shift
+    s1 = _rolling_sum(x, window)
+    s2 = _rolling_sum(x * x, window)
+    var = np.maximum(s2 - s1 * s1 / window, 0) / max(window - 1, 1)
+    return s1 / window + shift, np.sqrt(var)
+
+
+def _rolling_cov(x, y, window):
+    """
+    covariance (ddof=1) and variances of the pairs x, y over each window
+    """
+    sx, sy = _rolling_sum(x, window), _rolling_sum(y, window)
+    cov = (_rolling_sum(x * y, window) - sx * sy / window) / max(window - 1, 1)
+    var_x = np.maximum(_rolling_sum(x * x, window) - sx * sx / window, 0) / max(window - 1, 1)
+    var_y = np.maximum(_rolling_sum(y * y, window) - sy * sy / window, 0) / max(window - 1, 1)
+    return cov, var_x, var_y
+
+
+def _bar_sums(x, idx):
+    """
+    sum of tick values x over each bar, bar k has ticks idx[k-1]+1 to idx[k]
+    and the first bar has ticks 0 to idx[0]
+    """
+    c = np.cumsum(x)[idx]
+    c[1:] -= c[:-1].copy()
+    return c
+
+
+def _valid(x, n_valid):
+    """
+    set the first n_valid elements to np.nan, their windows are not full
+    """
+    x = np.array(x, dtype=np.float64) # copy, x may be shared by other features
+    x[:n_valid] = np.nan
+    return x
+
+
+def rolling_features(price, idx, window, vol=None, span=None, features=None):
+    """
+    rolling and EWM statistics of a tick series evaluated only at the sampled
+    bar indices, e.g. feature_end of meta_label() output or CUMSUM_filter() events
+    the window counts bars, not ticks, and every statistic is computed with
+    cumulative sums over the sampled bars, so the cost grows with the number
+    of bars; the microstructure features sum the ticks of each bar with one
+    cumsum over the ticks
+    @parameters:
+    price -- 1d vector
+        tick price
+    idx -- 1d vector of int
+        sorted tick indices where the features are sampled, the ticks
+        idx[k-1]+1 to idx[k] form bar k, if idx is a pd.Series its index
+        is used as the index of the output
+    window -- int
+        number of bars in each rolling window
+    vol -- 1d vector
+        tick volume with same length as price, default is None
+        needed by "kyle_lambda", "amihud" and "imbalance"
+    span -- float
+        span of the EWM features, default is None which uses window
+    features -- list of strings
+        subset of ROLLING_FEATURES to compute, default is None which computes
+        all of them, except the volume ones if vol is None
+        rtn: log return of bar k
+        cum_rtn: log return over the window
+        vol: std of bar returns over the window
+        zscore: (close - mean of close) / std of close over the window
+        autocorr: first order serial correlation of bar returns over the window
+        ewm_vol: EWM std of bar returns
+        ewm_zscore: (close - EWM mean of close) / EWM std of close
+        roll_spread: Roll's spread 2*sqrt(-cov(dp_t, dp_{t-1})) of the ticks in the window
+        kyle_lambda: slope of regressing dp_t on signed volume of the ticks in the window
+        amihud: mean of |rtn| / dollar volume of bars in the window
+        imbalance: |sum of signed volume| / sum of volume of the ticks in the window
+    @returns:
+    result -- dataframe
+        one row for each element of idx, one column for each feature
+        rows without a full window are np.nan
+    """
+    if features is None:
+        features = [f for f in ROLLING_FEATURES if vol is not None or f not in _VOL_FEATURES]
+    unknown = set(features) - set(ROLLING_FEATURES)
+    if unknown:
+        raise ValueError("features should be in: " + "/".join(ROLLING_FEATURES))
+    if vol is None and set(features) & set(_VOL_FEATURES):
+        raise ValueError("volume data is required")
+    if window < 1:
+        raise ValueError("window should be a positive integer")
+    index = idx.index if isinstance(idx, pd.Series) else None
+    price = np.asarray(price, dtype=np.float64)
+    idx = np.asarray(idx, dtype=np.int64)
+    span = window if span is None else span
+
+    close = price[idx]
+    rtn = np.zeros(len(idx))
+    rtn[1:] = np.diff(np.log(close)) # rtn[0] has no previous bar, kept 0 for the cumsums
+    result = {}
+    for name in features:
+        if name == "rtn":
+            result[name] = _valid(rtn, 1)
+        elif name == "cum_rtn":
+            result[name] = _valid(_rolling_sum(rtn, window), window)
+        elif name == "vol":
+            result[name] = _valid(_rolling_moments(rtn, window)[1], window)
+        elif name == "zscore":
+            mean, std = _rolling_moments(close, window)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                result[name] = _valid((close - mean) / std, window - 1)
+        elif name == "autocorr":
+            # window returns give window-1 pairs (rtn[k], rtn[k-1])
+            lag = np.concatenate(([0.0], rtn[:-1]))
+            cov, var_x, var_y = _rolling_cov(rtn, lag, max(window - 1, 1))
+            with np.errstate(divide="ignore", invalid="ignore"):
+                result[name] = _valid(cov / np.sqrt(var_x * var_y), max(window, 2))
+        elif name == "ewm_vol":
+            ewm_rtn = pd.Series(rtn[1:]).ewm(span=span, min_periods=window)
+            result[name] = np.concatenate(([np.nan], ewm_rtn.std().values))
+        elif name == "ewm_zscore":
+            ewm_close = pd.Series(close).ewm(span=span, min_periods=window)
+            result[name] = ((close - ewm_close.mean().values) / ewm_close.std().values)
+        else:
+            result[name] = _microstructure(name, price, idx, rtn, window, vol)
+    return pd.DataFrame(result, index=index, columns=features)
+
+
+def _microstructure(name, price, idx, rtn, window, vol):
+    """
+    microstructure features, the tick values are summed over each bar and
+    then over the window, see rolling_features()
+    """
+    dp = np.zeros(len(price))
+    dp[1:] = np.diff(price)
+    # a full window starts after the first bar, which has no previous tick
+    if name == "roll_spread":
+        lag = np.concatenate(([0.0], dp[:-1]))
+        n = _rolling_sum(_bar_sums(np.arange(len(price)) >= 2, idx), window)
+        sx = _rolling_sum(_bar_sums(dp, idx), window)
+        sy = _rolling_sum(_bar_sums(lag, idx), window)
+        sxy = _rolling_sum(_bar_sums(dp * lag, idx), window)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            cov = (sxy - sx * sy / n) / (n - 1)
+        return _valid(2 * np.sqrt(np.maximum(-cov, 0)), window)
+    vol = np.asarray(vol, dtype=np.float64)
+    if name == "amihud":
+        dollar = _bar_sums(price * vol, idx)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return _valid(_rolling_sum(np.abs(rtn) / dollar, window) / window, window)
+    signed = tick_rule(price, vol, mode="volume")
+    if name == "imbalance":
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return _valid(np.abs(_rolling_sum(_bar_sums(signed, idx), window)) /
+                          _rolling_sum(_bar_sums(vol, idx), window), window)
+    # kyle_lambda
+    n = _rolling_sum(_bar_sums(np.ones(len(price)), idx), window)
+    sx = _rolling_sum(_bar_sums(signed, idx), window)
+    sy = _rolling_sum(_bar_sums(dp, idx), window)
+    sxy = _rolling_sum(_bar_sums(signed * dp, idx), window)
+    sxx = _rolling_sum(_bar_sums(signed * signed, idx), window)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return _valid((sxy - sx * sy / n) / (sxx - sx * sx / n), window)
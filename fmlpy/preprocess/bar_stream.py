@@ -0,0 +1,500 @@
+import pandas as pd
+import numpy as np
+from pandas.tseries.frequencies import to_offset
+from .bars import _preprocess, _ohlc, _empty_bars, _fixed_window, _ffill_sign, tick_rule, EMAEstimator
+
+
+class _BarBuilder:
+    def __init__(self, need_vol):
+        """
+        base class of all streaming bar builders
+        a builder receives ticks chunk by chunk through update() and only
+        keeps the state of the bar that is still open, so feeding a day of
+        ticks in pieces costs the same as one batch call
+        subclasses implement _label(), which gives every tick of a chunk the
+        global id of the bar it belongs to and sets self._open_label to the
+        id of the bar that may still receive ticks
+        @parameters:
+        need_vol -- binary
+            whether the input chunk has a third column of volume
+        """
+        self._need_vol = need_vol
+        self._n_seen = 0 # number of ticks consumed so far, used as global idx
+        self._partial = None # one-row dataframe of the open bar, indexed by bar id
+        self._open_label = None
+        self._last_price = None # last price and direction, to continue tick_rule()
+        self._last_b = 0
+        # returned when there is no bar, takes the dtypes of the last chunk
+        self._empty = _empty_bars(np.zeros(0, dtype='datetime64[ns]'), np.zeros(0))
+
+    def update(self, chunk):
+        """
+        consume a chunk of ticks
+        @parameters:
+        chunk -- dataframe
+            same layout as the data accepted by the batch functions
+        @returns:
+        bars -- dataframe (start_t, end_t, start_idx, end_idx, low, high, open, close)
+            bars completed by this chunk, may be empty
+        """
+        data = self._frame(chunk)
+        if len(data.price) > 0:
+            self._empty = _empty_bars(data.time, data.price)
+        if len(data.price) == 0:
+            return self._empty.copy()
+        labels = self._label(data)
+        return self._collect(data, labels)
+
+    def flush(self):
+        """
+        close the bar that is still open, call it at the end of the stream
+        @returns:
+        bars -- dataframe (start_t, end_t, start_idx, end_idx, low, high, open, close)
+            the last (partial) bar, empty if there is none
+        """
+        if self._partial is None:
+            return self._empty.copy()
+        res = self._partial.reset_index(drop=True)
+        self._partial = None
+        return res
+
+    def _frame(self, chunk):
+        return _preprocess(chunk, need_vol=self._need_vol)
+
+    def _label(self, data):
+        raise NotImplementedError
+
+    def _direction(self, price):
+        """
+        b_t of a chunk, continuing from the last tick of the previous chunk
+        gives the same sequence as bars.tick_rule() on the concatenated prices
+        """
+        price = np.asarray(price)
+        if self._last_price is None:
+            b_t = np.sign(np.diff(price))
+            b_t = np.insert(b_t, 0, 0)
+        else:
+            b_t = np.sign(np.diff(np.insert(price, 0, self._last_price)))
+        b_t = _ffill_sign(b_t, self._last_b)
+        self._last_price = price[-1]
+        self._last_b = b_t[-1]
+        return b_t
+
+    def _collect(self, data, labels):
+        """
+        aggregate a labelled chunk and merge it with the open bar
+        """
+        starts = np.flatnonzero(np.diff(labels)) + 1
+        starts = np.insert(starts, 0, 0) # labels never decrease, so bars are contiguous
+        agg = _ohlc(data.time, data.price, starts, self._n_seen)
+        agg.index = labels[starts]
+        self._n_seen += len(data.price)
+
+        if self._partial is not None:
+            if agg.index[0] == self._partial.index[0]:
+                prev = self._partial.iloc[0]
+                agg.iloc[0, agg.columns.get_loc('start_t')] = prev['start_t']
+                agg.iloc[0, agg.columns.get_loc('start_idx')] = prev['start_idx']
+                agg.iloc[0, agg.columns.get_loc('open')] = prev['open']
+                agg.iloc[0, agg.columns.get_loc('low')] = min(prev['low'], agg['low'].iloc[0])
+                agg.iloc[0, agg.columns.get_loc('high')] = max(prev['high'], agg['high'].iloc[0])
+            else:
+                agg = pd.concat([self._partial, agg])
+
+        is_open = agg.index == self._open_label
+        self._partial = agg[is_open] if is_open.any() else None
+        return agg[~is_open].dropna().reset_index(drop=True)
+
+
+class TimeBarBuilder(_BarBuilder):
+    def __init__(self, time_window):
+        """
+        streaming version of bars.time_bar()
+        bins are aligned to midnight of the first tick, as pandas resample does,
+        with timezone-aware time it is the local midnight and day windows follow
+        the local calendar, the chunks should be sorted in time
+        @parameters:
+        time_window -- string
+            fixed length window such as "3s", "1min", "1H", "1D"
+            calendar windows ("M", "W", ...) are not supported in streaming mode
+        """
+        super().__init__(need_vol=False)
+        self._window = _fixed_window(time_window)
+        if self._window is None:
+            raise ValueError("streaming time bar needs a fixed length time_window")
+        self._days = isinstance(to_offset(time_window), pd.offsets.Day)
+        self._origin = None
+        self._last_t = None # last tick of the previous chunk, in UTC nanoseconds
+
+    def _frame(self, chunk):
+        data = _preprocess(chunk, check_sorted=False)
+        time = pd.DatetimeIndex(pd.to_datetime(data.time))
+        if time.tz is None:
+            time = time.to_numpy().astype('datetime64[ns]', copy=False)
+        return data._replace(time=time)
+
+    def _label(self, data):
+        time = pd.DatetimeIndex(data.time).as_unit('ns')
+        t_ns = time.asi8
+        if np.any(t_ns[1:] < t_ns[:-1]) or (self._last_t is not None and t_ns[0] < self._last_t):
+            raise ValueError("time should be sorted")
+        self._last_t = t_ns[-1]
+        # day windows are counted on the local wall clock, so they keep
+        # following local midnight when the UTC offset changes
+        if self._days and time.tz is not None:
+            t_ns = time.tz_localize(None).asi8
+            if self._origin is None:
+                self._origin = t_ns[0] - t_ns[0] % (86400 * 10**9)
+        elif self._origin is None:
+            self._origin = time[:1].normalize().asi8[0]
+        labels = (t_ns - self._origin) // self._window
+        self._open_label = labels[-1]
+        return labels
+
+
+class VolumeBarBuilder(_BarBuilder):
+    def __init__(self, size):
+        """
+        streaming version of bars.volume_bar()
+        @parameters:
+        size -- integer
+            volume of each bar
+        """
+        if not isinstance(size, int):
+            raise TypeError("Size should be an integer")
+        super().__init__(need_vol=True)
+        self._size = size
+        self._cum = 0
+
+    def _amount(self, data):
+        return data.vol
+
+    def _label(self, data):
+        # prepend the running total so the cumulative sum is added up in
+        # exactly the same order as the batch version
+        cum = np.cumsum(np.insert(self._amount(data), 0, self._cum))[1:]
+        self._cum = cum[-1]
+        labels = cum // self._size
+        self._open_label = labels[-1]
+        return labels
+
+
+class DollarBarBuilder(VolumeBarBuilder):
+    def __init__(self, bar):
+        """
+        streaming version of bars.dollar_bar()
+        @parameters:
+        bar -- integer
+            dollar value of each bar
+        """
+        if not isinstance(bar, int):
+            raise TypeError("Dollar bar should be an integer")
+        super().__init__(bar)
+
+    def _amount(self, data):
+        return data.price * data.vol
+
+
+class ImbalanceBarBuilder(_BarBuilder):
+    def __init__(self, ET_window, P_window, warm_up_len=100, mode="TIB"):
+        """
+        streaming version of bars.imbalance_bar()
+        @parameters:
+        ET_window -- scalar
+            EMV window size to estimate E[T]
+        P_window -- scalar
+            EMV window size to estimate 2P(b_t==1) - 1
+        warm_up_len -- scalar
+            expected length of the first bar, default is 100
+        mode -- string
+            can only be "TIB"(tick imbalance bar) or "VIB"(volume imbalance bar)
+        """
+        assert mode in ["TIB","VIB"], "please enter mode of imbalance bar: TIB/VIB"
+        super().__init__(need_vol=(mode == "VIB"))
+        self._mode = mode
+        self._ET_ema = EMAEstimator(ET_window)
+        self._P_ema = EMAEstimator(P_window)
+        self._E_theta = warm_up_len * 0.5
+        self._n_bar = 0
+        self._theta = 0
+        self._increment = 0
+        self._open_label = 0
+
+    def _label(self, data):
+        b_t = self._direction(data.price)
+        if self._mode == "VIB":
+            b_t = b_t * data.vol
+        labels = np.empty(len(b_t), dtype='int64')
+        n_bar = self._n_bar
+        for i, b in enumerate(b_t.tolist()):
+            labels[i] = n_bar
+            self._theta += b
+            self._increment += 1
+            P_estimate = self._P_ema.update(b)
+            if abs(self._theta) >= self._E_theta:
+                E_T = self._ET_ema.update(self._increment)
+                n_bar += 1
+                self._theta, self._increment = 0, 0
+                self._E_theta = E_T * abs(P_estimate)
+        self._n_bar = n_bar
+        self._open_label = n_bar
+        return labels
+
+    def flush(self):
+        if self._n_bar == 0 and self._n_seen > 0:
+            raise ValueError("No such bar can be created!")
+        return super().flush()
+
+
+class TickRunBarBuilder(_BarBuilder):
+    def __init__(self, ET_window, bt1_window, warm_up_len=100):
+        """
+        streaming version of bars.tick_run_bar()
+        @parameters:
+        ET_window -- scalar
+            EMV window size to estimate E[T]
+        bt1_window -- scalar
+            EMV window size to estimate proportion of b_t==1 in each bar
+        warm_up_len -- scalar
+            expected length of the first bar, default is 100
+        """
+        super().__init__(need_vol=False)
+        self._ET_ema = EMAEstimator(ET_window)
+        self._P_bt1_ema = EMAEstimator(bt1_window)
+        self._E_theta = warm_up_len * 0.5
+        self._n_bar = 0
+        self._pos_cnt, self._neg_cnt = 0, 0
+        self._increment = 0
+        self._open_label = 0
+
+    def _label(self, data):
+        b_t = self._direction(data.price)
+        labels = np.empty(len(b_t), dtype='int64')
+        n_bar = self._n_bar
+        for i, b in enumerate(b_t.tolist()):
+            labels[i] = n_bar
+            if b == 1:
+                self._pos_cnt += 1
+            elif b == -1:
+                self._neg_cnt += 1
+            self._increment += 1
+
+            if max(self._pos_cnt, self._neg_cnt) >= self._E_theta:
+                E_T = self._ET_ema.update(self._increment)
+                P_bt1 = self._P_bt1_ema.update(self._pos_cnt/self._increment)
+                n_bar += 1
+                self._pos_cnt, self._neg_cnt = 0, 0
+                self._increment = 0
+                self._E_theta = E_T * max(P_bt1, 1 - P_bt1)
+        self._n_bar = n_bar
+        self._open_label = n_bar
+        return labels
+
+
+class VolRunBarBuilder(_BarBuilder):
+    def __init__(self, ET_window, bt1_window, pos_vol_window, neg_vol_window, warm_up_len=100):
+        """
+        streaming version of bars.vol_run_bar()
+        the first warm_up_len ticks are needed to initialize the estimators,
+        so no bar is returned before that many ticks have been received
+        @parameters:
+        ET_window -- scalar
+            EMV window size to estimate E[T]
+        bt1_window -- scalar
+            EMV window size to estimate proportion of b_t==1 in each bar
+        pos_vol_window -- scalar
+            EMV window size to estimate E(v_t|b_t==1)
+        neg_vol_window -- scalar
+            EMV window size to estimate E(v_t|b_t==-1)
+        warm_up_len -- scalar
+            how many data should we use to warm up, default is 100
+        """
+        super().__init__(need_vol=True)
+        self._ET_ema = EMAEstimator(ET_window)
+        self._P_bt1_ema = EMAEstimator(bt1_window)
+        self._pos_vol_ema = EMAEstimator(pos_vol_window)
+        self._neg_vol_ema = EMAEstimator(neg_vol_window)
+        self._warm_up_len = warm_up_len
+        self._pending = [] # chunks received before warm up is finished
+        self._n_pending = 0
+        self._initialized = False
+        self._n_bar = 0
+        self._pos_vol, self._neg_vol = 0, 0
+        self._pos_cnt, self._neg_cnt = 0, 0
+        self._increment = 0
+        self._open_label = 0
+
+    def update(self, chunk):
+        if self._initialized:
+            return super().update(chunk)
+        data = self._frame(chunk)
+        if len(data.price) > 0:
+            self._empty = _empty_bars(data.time, data.price)
+        self._pending.append(data)
+        self._n_pending += len(data.price)
+        if self._n_pending < self._warm_up_len:
+            return self._empty.copy()
+        return self._release()
+
+    def flush(self):
+        if not self._initialized and self._n_pending > 0:
+            res = self._release()
+            return pd.concat([res, super().flush()], ignore_index=True)
+        return super().flush()
+
+    def _release(self):
+        data = type(self._pending[0])(*[np.concatenate(col) for col in zip(*self._pending)])
+        self._pending, self._n_pending = [], 0
+        self._init_estimators(data)
+        return super().update(data)
+
+    def _init_estimators(self, data):
+        # same initialization as bars.vol_run_bar(), computed on the first
+        # warm_up_len ticks without touching the streaming direction state
+        t0 = self._warm_up_len
+        price = data.price
+        vol = data.vol
+        b_t = tick_rule(price)
+
+        P_bt1 = self._P_bt1_ema.update(np.count_nonzero(b_t[:t0]==1)/t0)
+        pos_loc = np.where(b_t[:t0]==1)[0]
+        E_v_bt_pos = self._pos_vol_ema.update(np.mean(vol[pos_loc]) if len(pos_loc) else 0)
+        neg_loc = np.where(b_t[:t0]==1)[0]
+        E_v_bt_neg = self._neg_vol_ema.update(np.mean(vol[neg_loc]) if len(neg_loc) else 0)
+        self._E_theta = t0 * max(E_v_bt_pos*P_bt1, E_v_bt_neg*(1-P_bt1))
+        self._initialized = True
+
+    def _label(self, data):
+        b_t = self._direction(data.price)
+        vol = data.vol
+        labels = np.empty(len(b_t), dtype='int64')
+        n_bar = self._n_bar
+        for i in range(len(b_t)):
+            labels[i] = n_bar
+            if b_t[i] == 1:
+                self._pos_vol += vol[i]
+                self._pos_cnt += 1
+            elif b_t[i] == -1:
+                self._neg_vol += vol[i]
+                self._neg_cnt += 1
+            self._increment += 1
+
+            if max(self._pos_vol, self._neg_vol) >= self._E_theta:
+                E_T = self._ET_ema.update(self._increment)
+                P_bt1 = self._P_bt1_ema.update(self._pos_cnt/self._increment)
+                E_v_bt_pos = self._pos_vol_ema.update(self._pos_vol/self._increment)
+                E_v_bt_neg = self._neg_vol_ema.update(self._neg_vol/self._increment)
+                n_bar += 1
+                self._pos_cnt, self._neg_cnt = 0, 0
+                self._pos_vol, self._neg_vol = 0, 0
+                self._increment = 0
+                self._E_theta = E_T * max(E_v_bt_pos*P_bt1, E_v_bt_neg * (1 - P_bt1))
+        self._n_bar = n_bar
+        self._open_label = n_bar
+        return labels
+
+
+BUILDERS = {"time": TimeBarBuilder, "volume": VolumeBarBuilder, "dollar": DollarBarBuilder,
+            "imbalance": ImbalanceBarBuilder, "tick_run": TickRunBarBuilder, "vol_run": VolRunBarBuilder}
+
+
+def _read_chunks(path, chunksize, columns):
+    """
+    yield a tick file chunk by chunk
+    .parquet/.pq files are read by row batches with pyarrow, everything else as csv
+    """
+    if path.endswith((".parquet", ".pq")):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("pyarrow is required to read parquet files")
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize, columns=columns):
+            yield batch.to_pandas()
+    else:
+        for chunk in pd.read_csv(path, chunksize=chunksize, usecols=columns):
+            yield chunk if columns is None else chunk[columns]
+
+
+class _BarWriter:
+    def __init__(self, out):
+        """
+        append bars to a csv or parquet file as they are completed
+        @parameters:
+        out -- string
+            path of output file, .parquet/.pq is written with pyarrow, otherwise csv
+        """
+        self.out = out
+        self.n_bar = 0
+        self._parquet = out.endswith((".parquet", ".pq"))
+        self._writer = None
+
+    def write(self, res):
+        if res.shape[0] == 0:
+            return
+        if self._parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            table = pa.Table.from_pandas(res, preserve_index=False)
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self.out, table.schema)
+            self._writer.write_table(table)
+        else:
+            res.to_csv(self.out, mode="w" if self.n_bar == 0 else "a",
+                       header=(self.n_bar == 0), index=False)
+        self.n_bar += res.shape[0]
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+
+def from_files(paths, kind, out=None, chunksize=1000000, columns=None, **kwargs):
+    """
+    generate bars from tick files that don't fit in memory
+    files are read chunk by chunk and fed to one streaming builder, so a bar can
+    span chunks and files, and only the open bar is kept between chunks
+    start_idx/end_idx count ticks over all files
+    @parameters:
+    paths -- string or list of strings
+        csv or parquet (.parquet/.pq) tick files, read in the given order
+    kind -- string
+        one of "time"/"volume"/"dollar"/"imbalance"/"tick_run"/"vol_run"
+    out -- string
+        default is None, which returns all bars as one dataframe
+        otherwise bars are appended to this csv or parquet file as they are completed
+    chunksize -- int
+        number of ticks read each time, default is 1000000
+    columns -- list of strings
+        columns of time, price(, volume) in the files, default is None which
+        means the files already have them as first columns
+    kwargs --
+        parameters of the builder, e.g. size for "volume", bar for "dollar",
+        time_window for "time", see the builder classes in this module
+    @returns:
+    bars -- dataframe (start_t, end_t, start_idx, end_idx, low, high, open, close)
+        or the number of bars written if out is given
+    """
+    if kind not in BUILDERS:
+        raise ValueError("kind should be one of: " + "/".join(BUILDERS))
+    if isinstance(paths, str):
+        paths = [paths]
+    builder = BUILDERS[kind](**kwargs)
+    writer = _BarWriter(out) if out is not None else None
+    res = []
+    try:
+        for path in paths:
+            for chunk in _read_chunks(path, chunksize, columns):
+                new_bars = builder.update(chunk)
+                if writer is not None:
+                    writer.write(new_bars)
+                else:
+                    res.append(new_bars)
+        last = builder.flush()
+        if writer is not None:
+            writer.write(last)
+            return writer.n_bar
+        res.append(last)
+        return pd.concat(res, ignore_index=True)
+    finally:
+        if writer is not None:
+            writer.close()
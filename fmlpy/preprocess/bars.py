@@ -1,67 +1,145 @@
 import pandas as pd
 import numpy as np
-import itertools
+from collections import namedtuple
+from pandas.tseries.frequencies import to_offset
+from . import backend as _backend
+
+BAR_COLUMNS = ['start_t', 'end_t', 'start_idx', 'end_idx', 'low', 'high', 'open', 'close']
+_Ticks = namedtuple("_Ticks", ["time", "price", "vol"]) # output of _preprocess()
 
 def _bar2df(bars,data):
     """
     get subset of data according to the location provided by bar_loc
     @parameters:
-    data -- dataframe
-        first column should be time second column should be price
+    data -- _Ticks
+        output of _preprocess()
     bars -- np.array
         each element in bars represent the length of that bar
     @returns:
     res -- dataframe
-        dataframe (start_t, end_t, start_idx, end_idx, high, low, close, open)
+        dataframe (start_t, end_t, start_idx, end_idx, low, high, open, close)
+    """
+    bars = np.asarray(bars, dtype=np.int64)
+    bars = bars[bars > 0] # empty bars don't have any tick to aggregate
+    starts = np.cumsum(bars) - bars
+    return _ohlc(data.time, data.price, starts)
+
+
+def _ohlc(time, price, starts, idx_offset=0):
     """
-    tmp = list(map(lambda x: [x[0] for _ in range(x[1])],list(enumerate(bars))))
-    labels = list(itertools.chain(*tmp)) # tmp is a list of list and this line flattens it
-    data["labels"] = labels
-    data["index"] = list(range(data.shape[0]))
-    aggregation_condition = {'time': ['first', 'last'], \
-                             'index':['first', 'last'], \
-                             'price': ['min', 'max', 'first', 'last']}
-    res = data.groupby("labels",as_index=False).agg(aggregation_condition)
-    res.columns = ['_'.join(col) for col in res.columns.values]
-    res = res.drop(["labels_"],axis=1)
-    res.columns = ['start_t', 'end_t', 'start_idx', 'end_idx','low', 'high', 'open', 'close']
+    aggregate ticks into bars, bar i covers ticks starts[i] to starts[i+1]-1
+    high/low come from np.maximum.reduceat/np.minimum.reduceat and the other
+    columns are gathered at the bar boundaries, so no per tick label is built
+    @parameters:
+    time -- 1d np.ndarray
+    price -- 1d np.ndarray
+        has same length with time
+    starts -- 1d np.ndarray
+        strictly increasing, starts[0] should be 0
+    idx_offset -- int
+        added to start_idx and end_idx, default is 0
+        used when ticks come in chunks
+    @returns:
+    res -- dataframe
+        dataframe (start_t, end_t, start_idx, end_idx, low, high, open, close)
+    """
+    price = np.asarray(price)
+    starts = np.asarray(starts, dtype=np.int64)
+    if len(starts) == 0:
+        return _empty_bars(time, price)
+    ends = np.append(starts[1:], len(price)) - 1
+    if price.dtype.kind == 'f': # ignore NaN like groupby().agg() does
+        low, high = np.fmin.reduceat(price, starts), np.fmax.reduceat(price, starts)
+    else:
+        low, high = np.minimum.reduceat(price, starts), np.maximum.reduceat(price, starts)
+    res = pd.DataFrame({'start_t': time[starts], 'end_t': time[ends],
+                        'start_idx': starts + idx_offset, 'end_idx': ends + idx_offset,
+                        'low': low, 'high': high, 'open': price[starts], 'close': price[ends]},
+                       columns=BAR_COLUMNS)
     return res
 
 
-def _preprocess(data, need_vol=False):
+def _empty_bars(time, price):
+    """
+    bars dataframe without any row, with the dtypes bars of time and price have,
+    so concatenating it with other bars keeps their dtypes
+    it is built from one tick and emptied, so the dtype pandas infers for
+    object time (e.g. strings) is the same as in non-empty bars
+    """
+    n = min(len(time), 1)
+    time, price = time[:n], np.asarray(price)[:n]
+    idx = np.zeros(n, dtype=np.int64)
+    return pd.DataFrame({'start_t': time, 'end_t': time, 'start_idx': idx, 'end_idx': idx,
+                         'low': price, 'high': price, 'open': price, 'close': price},
+                        columns=BAR_COLUMNS).iloc[:0]
+
+
+def _preprocess(data, need_vol=False, check_sorted=True):
     """
     this function is used to do the following things:
     1. exception handling (determine if the data is ideal data)
-    2. aggregate the data input as a dataframe
+    2. turn the input into numpy arrays, without copying when they already are
+       contiguous int64/float64 columns
     Note that this function is a private function only for this module
+    and it never modifies the input
     @requires:
     pandas
     @parameters:
-    data--dataframe
-        default is None
+    data--dataframe, structured np.ndarray or tuple of 1d vectors
         the ideal data should have at least one columns: price
         if only one column, then we need add another column T (use index of each row)
         if two column, treat the first column as T
         if need_vol is True, then must have three columns and treat the third column as Volume
-        need_vol--binary
+        columns of a dataframe and fields of a structured array are taken in order,
+        a tuple is read as (time, price) or (time, price, vol)
+    need_vol--binary
         default is False
         when need_vol == False, the data variable can have two columns
         when need_vol == True, the data variable should have at least three columns with the last column is volume
+    check_sorted--binary
+        default is True, raise ValueError if numeric or datetime time is not sorted
+        time_bar() checks the order itself because it can bar unsorted ticks
     @returns:
-    data-- dataframe
-        with two or three columns
-        if two column, treat the first column as T
-        if need_vol is True, then must have three columns and treat the third column as Volume
+    data-- _Ticks(time, price, vol)
+        time -- 1d np.ndarray as in the input, checked to be sorted if it is numeric or datetime
+        price -- 1d np.ndarray of int64 or float64
+        vol -- 1d np.ndarray of int64 or float64, None if need_vol is False
     """
-    if not isinstance(data,pd.DataFrame):
-        raise TypeError("the input should be DataFrame")
-    if not need_vol:
-        data = data.iloc[:, :2]
-        data.columns = ["time","price"]
+    if isinstance(data, pd.DataFrame):
+        columns = [data.iloc[:, i].to_numpy() for i in range(min(data.shape[1], 3))]
+    elif isinstance(data, np.ndarray) and data.dtype.names is not None:
+        columns = [data[name] for name in data.dtype.names[:3]]
+    elif isinstance(data, (tuple, list)):
+        columns = [np.asarray(col) for col in data[:3]]
     else:
-        data = data.iloc[:, :3]
-        data.columns = ["time","price","vol"]
-    return data
+        raise TypeError("the input should be DataFrame, structured np.ndarray or tuple of arrays")
+    if len(columns) == 1:
+        columns.insert(0, np.arange(len(columns[0])))
+    if need_vol and len(columns) < 3:
+        raise ValueError("volume data is required")
+
+    time = columns[0]
+    price = _as_numeric(columns[1], "price")
+    vol = _as_numeric(columns[2], "volume") if need_vol else None
+    if len(time) != len(price) or (need_vol and len(vol) != len(price)):
+        raise ValueError("time, price and volume should have same length")
+    if check_sorted and time.dtype.kind in "iufM" and np.any(time[1:] < time[:-1]):
+        raise ValueError("time should be sorted")
+    return _Ticks(time, price, vol)
+
+def _as_numeric(values, name):
+    """
+    view values as a contiguous int64 or float64 array, copy only if needed
+    """
+    values = np.asarray(values)
+    if values.dtype.kind not in "biuf":
+        try:
+            values = pd.to_numeric(values)
+        except (ValueError, TypeError):
+            raise TypeError("%s should be numeric" % name)
+    if values.dtype.kind in "biu":
+        return np.ascontiguousarray(values, dtype=np.int64)
+    return np.ascontiguousarray(values, dtype=np.float64)
 
 def _EMA(vec, win):
     """
@@ -90,44 +168,203 @@ def _EMA(vec, win):
         ema_series[i] = alpha*vec[i] + (1-alpha)*ema_series[i-1]
     return ema_series
 
-def _direction(price,vol=None,mode="tick"):
+def _EMA_len(win):
+    """
+    number of elements _EMA() actually looks at
+    _EMA() truncates its input to the first k elements, so any history
+    longer than k never changes the estimate
+    @parameters:
+        win--scalar
+    @returns:
+        k--int
+    """
+    if win == 1:
+        return 1
+    alpha = 2/(1+win)
+    err = 0.000001
+    return int(np.ceil(np.log(err) / np.log(1-alpha)))
+
+class EMAEstimator:
+    def __init__(self, win):
+        """
+        exponential moving average updated one observation at a time
+        the estimate is the same as _EMA(vec, win)[-1] on the observations seen
+        so far, including the truncation to the first k observations, but each
+        update costs O(1) instead of a walk over the whole history
+        @parameters:
+        win -- scalar
+            EMA window size, alpha = 2/(1+win)
+        """
+        self.win = win
+        self.alpha = 2/(1+win)
+        self.max_len = _EMA_len(win) # _EMA() ignores everything after this
+        self.n = 0 # number of observations used in the estimate
+        self.value = None
+
+    @property
+    def full(self):
+        """
+        True once further observations can't change the estimate
+        """
+        return self.n >= self.max_len
+
+    def update(self, x):
+        """
+        add one observation
+        @parameters:
+        x -- scalar
+        @returns:
+        value -- scalar
+            current estimate
+        """
+        if self.n == 0:
+            self.value = x
+            self.n = 1
+        elif self.n < self.max_len:
+            self.value = self.alpha*x + (1-self.alpha)*self.value
+            self.n += 1
+        return self.value
+
+    def extend(self, vec):
+        """
+        add observations in order, stops reading vec as soon as the estimate is full
+        @parameters:
+        vec -- 1d vector
+        @returns:
+        value -- scalar
+            current estimate
+        """
+        for x in vec[:max(self.max_len - self.n, 0)]:
+            self.update(x)
+        return self.value
+
+def _ffill_sign(b_t, prev=0):
+    """
+    replace each 0 of b_t by the last non-zero element before it
+    the index of the last non-zero element is found with maximum.accumulate
+    @parameters:
+        b_t -- 1d np.ndarray
+        prev -- scalar
+            used for the zeros before the first non-zero element, default is 0
+    @returns:
+        b_t -- 1d np.ndarray
+            new array with same dtype, the input is not modified
+    """
+    last = np.where(b_t != 0, np.arange(len(b_t)), -1)
+    np.maximum.accumulate(last, out=last)
+    return np.where(last >= 0, b_t[last], prev).astype(b_t.dtype, copy=False)
+
+def tick_rule(price, vol=None, mode="tick"):
     """
     this function generate sequence b_t(in the book Chapter 2 section 3.2.1)
     formula: b_t = b_{t-1} if delta(p_t) == 0 else delta(p_t)/|delta(p_t)|
+    the output can be computed once and passed as b_t to imbalance_bar(),
+    tick_run_bar() and vol_run_bar()
     @parameter:
         price--n by 1 array
         vol -- n by 1 array
             has same length with price,default is None
-            needed if mode == "volume"
+            needed if mode == "volume" or mode == "dollar"
         mode -- string
-            must be in ["tick","volume"]
+            must be in ["tick","volume","dollar"]
+            "tick" returns b_t, "volume" returns b_t * vol,
+            "dollar" returns b_t * price * vol
     @returns:
         b_t -- n by 1 array
-        each element is either 1 or -1 or 0
+        when mode == "tick" each element is either 1 or -1 or 0
         represent the direction of price at t-1
     """
-    assert mode in ["tick",'volume'],"please enter correct mode: tick/volume"
+    assert mode in ["tick","volume","dollar"],"please enter correct mode: tick/volume/dollar"
+    price = np.asarray(price)
+    if mode != "tick" and vol is None:
+        raise ValueError("volume data is required")
+    if len(price) == 0:
+        return np.sign(price)
+    b_t = np.sign(np.diff(price)) # len(b_t) == N - 1
+    b_t = _ffill_sign(np.insert(b_t,0,0)) # now len(b_t) == N, the first element is 0
     if mode == "volume":
-        if not vol:
-            raise ValueError("volume data is required")
-        data = np.array(price) * np.array(vol)
-    else: # in this case mode == "tick"
-        data = np.array(price)
-    N = len(data)
-    b_t = np.sign(np.diff(data)) # len(b_t) == N - 1
-    b_t = np.insert(b_t,0,0) # now len(b_t) == N
-    loc = np.where(b_t==0)[0][1:] # ignore the first element because it should be 0
-    for i in loc:
-        b_t[i] = b_t[i-1]
+        return b_t * np.asarray(vol)
+    if mode == "dollar":
+        return b_t * price * np.asarray(vol)
+    return b_t
+
+def _check_b_t(b_t, data, mode="tick"):
+    """
+    use the signed series given by the caller, or compute it with tick_rule()
+    """
+    if b_t is None:
+        return tick_rule(data.price, data.vol, mode)
+    b_t = np.asarray(b_t)
+    if len(b_t) != len(data.price):
+        raise ValueError("b_t should have same length with data")
     return b_t
 
-def time_bar(data, time_window):
+def _fixed_window(time_window):
+    '''
+    length of a fixed time window in nanoseconds, None for calendar windows
+    such as W or M whose length depends on where they start
+    '''
+    offset = to_offset(time_window)
+    if isinstance(offset, pd.offsets.Tick):
+        return pd.Timedelta(offset).value
+    if isinstance(offset, pd.offsets.Day):
+        return offset.n * 86400 * 10**9
+    return None
+
+def _ffill_bars(res, bucket, bucket_t):
+    '''
+    insert flat bars for empty time windows
+    @parameters:
+        res: bars of the non-empty windows
+        bucket: 1d np.ndarray, window number of each row in res counted from the first window
+        bucket_t: 1d np.ndarray, start time of every window from the first to the last
+    '''
+    n_bucket = len(bucket_t)
+    filled = np.zeros(n_bucket, dtype=bool)
+    filled[bucket] = True
+    # position in res of the last non-empty window at or before each window
+    take = np.cumsum(filled) - 1
+    out = res.iloc[take].reset_index(drop=True)
+    empty = ~filled
+    if empty.any():
+        out.loc[empty, 'start_t'] = bucket_t[empty]
+        out.loc[empty, 'end_t'] = bucket_t[empty]
+        out.loc[empty, 'start_idx'] = out.loc[empty, 'end_idx']
+        for col in ['low', 'high', 'open']:
+            out.loc[empty, col] = out.loc[empty, 'close']
+    return out
+
+def _resample_bar(time, price, time_window, empty):
+    '''
+    time_bar() for calendar windows, timezone-aware time or unsorted ticks,
+    based on pandas resample
+    '''
+    frame = pd.DataFrame({'idx': np.arange(len(price)), 'price': price}, index=pd.DatetimeIndex(time))
+    agg = frame.resample(time_window).agg({'idx': ['first', 'last'], 'price': ['min', 'max', 'first', 'last']})
+    agg.columns = ['start_idx', 'end_idx', 'low', 'high', 'open', 'close']
+    filled = agg['start_idx'].notna().values
+    # empty windows are NaN in agg, the filled ones get the dtype of price back
+    res = agg[filled].astype({'start_idx':'int64', 'end_idx':'int64', 'low':price.dtype,
+                              'high':price.dtype, 'open':price.dtype, 'close':price.dtype})
+    res.insert(0, 'end_t', time[res['end_idx'].values])
+    res.insert(0, 'start_t', time[res['start_idx'].values])
+    res = res.reset_index(drop=True)
+    if empty == "ffill":
+        res = _ffill_bars(res, np.flatnonzero(filled), agg.index)
+    return res
+
+def time_bar(data, time_window, empty="drop", unit="ns"):
     '''
     Calculate HOLC for certain time window
     @requires:
         pandas
+    fixed length windows (H, T, S, L, U, N, D) are computed by integer division
+    of the timestamps and np.*.reduceat, other windows, timezone-aware or
+    unsorted datetime-like time fall back to pandas resample
     @param:
         data: input data with time and price
+            time can be datetime-like (unsorted or timezone-aware is allowed),
+            or sorted int64 epoch timestamps
         time_window: time window size, acceptable format and meaning are
             B         business day frequency
             C         custom business day frequency (experimental)
@@ -156,27 +393,101 @@ def time_bar(data, time_window):
             L, ms     milliseonds
             U         microseconds
             N, us     nanoseconds
+            with int64 timestamps it can also be an integer in the unit of the timestamps
+        empty: how to handle time windows without any tick
+            "drop" (default) leaves them out
+            "ffill" keeps them as flat bars at the previous close, with start_t/end_t
+            set to the window start and start_idx/end_idx to the previous end_idx
+        unit: unit of int64 timestamps, default is "ns", not used for datetime-like time
     @return:
         dataframe (start_t, end_t, start_idx, end_idx, high, low, close, open)
     '''
-    data = _preprocess(data)
-    data = data.assign(time= pd.to_datetime(data['time']), idx=list(range(data.shape[0])))
-    data = data.resample(time_window, on='time')
-    aggregated_data = data.agg(['min', 'max', 'first', 'last'])
-    times = aggregated_data['time']
-    index = aggregated_data['idx']
-    times.columns = ['min', 'max', 'start_t', 'end_t']
-    index.columns = ['min', 'max', 'start_idx', 'end_idx']
-    times = times[['start_t', 'end_t']]
-    index = index[['start_idx', 'end_idx']]
-    price = aggregated_data['price']
-    price.columns = ['low', 'high', 'open', 'close']
-    result = pd.concat([times, index, price], axis=1, sort=False)
-    result = result.reset_index()
-    result = result.drop(['time'], axis=1)
-    result = result.dropna()
-    result = result.astype({'start_idx':'int64','end_idx':'int64'})
-    return result
+    assert empty in ["drop","ffill"], "please enter correct empty: drop/ffill"
+    data = _preprocess(data, check_sorted=False)
+    price = data.price
+    time = data.time
+    if np.issubdtype(time.dtype, np.integer): # epoch timestamps
+        if np.any(time[1:] < time[:-1]):
+            raise ValueError("time should be sorted")
+        if isinstance(time_window, (int, np.integer)):
+            width = int(time_window)
+        else:
+            width = _fixed_window(time_window)
+            if width is None:
+                raise ValueError("int64 timestamps need a fixed length time_window")
+            width = width // pd.Timedelta(1, unit=unit).value
+        if width <= 0:
+            raise ValueError("time_window should be at least one %s" % unit)
+        day = pd.Timedelta(1, unit='D') // pd.Timedelta(1, unit=unit)
+        ticks = time
+    else:
+        time = pd.DatetimeIndex(pd.to_datetime(time))
+        if time.tz is not None: # windows start from local midnight, resample keeps the timezone
+            return _resample_bar(time, price, time_window, empty)
+        time = time.to_numpy().astype('datetime64[ns]', copy=False)
+        width = _fixed_window(time_window)
+        day = 86400 * 10**9
+        ticks = time.view('int64')
+        if width is not None and width <= 0:
+            raise ValueError("time_window should be positive")
+        if width is None or np.any(np.diff(ticks) < 0):
+            return _resample_bar(time, price, time_window, empty)
+    if len(ticks) == 0:
+        return _empty_bars(time, price)
+
+    # windows start from midnight of the first day, same as pandas resample
+    origin = ticks[0] - ticks[0] % day
+    bucket = (ticks - origin) // width
+    starts = np.flatnonzero(np.diff(bucket)) + 1
+    starts = np.insert(starts, 0, 0)
+    res = _ohlc(time, price, starts)
+    if empty == "ffill":
+        n_bucket = bucket[-1] - bucket[0] + 1
+        bucket_t = (origin + (bucket[0] + np.arange(n_bucket)) * width).astype(ticks.dtype)
+        res = _ffill_bars(res, bucket[starts] - bucket[0], bucket_t.view(time.dtype))
+    return res
+
+def _check_thresholds(thres, msg):
+    '''
+    turn an integer or a list of integers into a list, raise TypeError otherwise
+    '''
+    multi = isinstance(thres, (list, tuple, np.ndarray))
+    thres_list = list(thres) if multi else [thres]
+    for t in thres_list:
+        if not isinstance(t, (int, np.integer)):
+            raise TypeError(msg)
+    return thres_list, multi
+
+def _cum_bounds(cum, size):
+    '''
+    start offset of each bar when ticks are grouped by cum // size
+    the i-th level is crossed at the first tick with cum >= i*size, so the bar
+    boundaries are found by np.searchsorted() over the levels instead of a groupby
+    @parameters:
+        cum -- 1d np.ndarray
+            non-decreasing cumulative volume/dollar
+        size -- integer
+    @return:
+        starts -- 1d np.ndarray
+    '''
+    N = len(cum)
+    if N == 0:
+        return np.zeros(0, dtype=np.int64)
+    n_level = int(cum[-1] // size)
+    if n_level > N: # more levels than ticks, cheaper to look at every tick
+        starts = np.flatnonzero(np.diff(cum // size)) + 1
+    else:
+        starts = np.searchsorted(cum, np.arange(1, n_level + 1) * size, side='left')
+    starts = np.concatenate(([0], starts))
+    starts = starts[np.concatenate(([True], np.diff(starts) > 0))] # already sorted, drop repeats
+    return starts[starts < N]
+
+def _cum_bar(data, cum, thres_list, multi):
+    '''
+    bars of all thresholds from one cumulative sum
+    '''
+    res = {t: _ohlc(data.time, data.price, _cum_bounds(cum, t)).dropna() for t in thres_list}
+    return res if multi else res[thres_list[0]]
 
 def volume_bar(data, size):
     '''
@@ -185,26 +496,16 @@ def volume_bar(data, size):
         pandas
     @parameters:
         data: input data with time, price and volume
-        size: input volume bar, integer
+        size: input volume bar, integer or list of integers
+            a list computes bars of every size from one pass over the volume
     @return:
         dataframe (start_t, end_t, start_idx, end_idx, high, low, close, open)
+        or a dict of such dataframes keyed by size if size is a list
     '''
     data = _preprocess(data, True)
-    if not isinstance(size, int):
-        raise TypeError("Size should be an integer")
-    data.loc[:, 'vol'] = pd.to_numeric(data['vol'])
-    data.loc[:, 'cumsum'] = data['vol'].cumsum()
-    data['cumsum'] = data['cumsum'] // size
-    data = data.assign(idx=list(range(data.shape[0])))
-    data['idx'] = data['idx'].astype('int64')
-    aggregated_data = data.groupby('cumsum').agg({'time': ['first', 'last'], 'idx': ['first', 'last'], 
-        'price': ['min', 'max', 'first', 'last']})
-    aggregated_data.columns = [' '.join(col).strip() for col in aggregated_data.columns.values]
-    aggregated_data.columns = ['start_t', 'end_t', 'start_idx', 'end_idx','low', 'high', 'open', 'close']
-    result = aggregated_data.reset_index()
-    result = result.drop(['cumsum'], axis=1)
-    result = result.dropna()
-    return result
+    sizes, multi = _check_thresholds(size, "Size should be an integer")
+    cum = np.cumsum(data.vol)
+    return _cum_bar(data, cum, sizes, multi)
 
 def dollar_bar(data, bar):
     '''
@@ -213,29 +514,18 @@ def dollar_bar(data, bar):
         pandas
     @parameters:
         data: input data with time, price and volume
-        bar: input dollar bar, integer
+        bar: input dollar bar, integer or list of integers
+            a list computes bars of every size from one pass over the dollar volume
     @return:
         dataframe (start_t, end_t, start_idx, end_idx, high, low, close, open)
+        or a dict of such dataframes keyed by bar if bar is a list
     '''
     data = _preprocess(data, True)
-    if not isinstance(bar, int):
-        raise TypeError("Dollar bar should be an integer")
-    data.loc[:, 'vol'] = pd.to_numeric(data['vol'])
-    data['dollar'] = data['price'] * data['vol']
-    data.loc[:, 'cumsum'] = data['dollar'].cumsum()
-    data['cumsum'] = data['cumsum'] // bar
-    data = data.assign(idx=list(range(data.shape[0])))
-    data['idx'] = data['idx'].astype('int64')
-    aggregated_data = data.groupby('cumsum').agg({'time': ['first', 'last'], 'idx': ['first', 'last'],
-        'price': ['min', 'max', 'first', 'last']})
-    aggregated_data.columns = [' '.join(col).strip() for col in aggregated_data.columns.values]
-    aggregated_data.columns = ['start_t', 'end_t', 'start_idx', 'end_idx','low', 'high', 'open', 'close']
-    result = aggregated_data.reset_index()
-    result = result.drop(['cumsum'], axis=1)
-    result = result.dropna()
-    return result
+    bars, multi = _check_thresholds(bar, "Dollar bar should be an integer")
+    cum = np.cumsum(data.price * data.vol)
+    return _cum_bar(data, cum, bars, multi)
 
-def imbalance_bar(data,ET_window,P_window, warm_up_len = 100,mode="TIB"):
+def imbalance_bar(data,ET_window,P_window, warm_up_len = 100,mode="TIB",backend=None,b_t=None):
     """
     calculate the tick imbalance bar
     @parameters:
@@ -250,6 +540,11 @@ def imbalance_bar(data,ET_window,P_window, warm_up_len = 100,mode="TIB"):
             default is 100
         mode -- string
             can only be "TIB"(tick imbalance bar) or "VIB"(volume imbalance bar)
+        backend -- string
+            "python" or "numba", default is None which means backend.get_backend()
+        b_t -- 1d array
+            tick_rule(price) for TIB or tick_rule(price, vol, "volume") for VIB
+            default is None which computes it from data
     @returns:
         dataframe (start_t, end_t, start_idx, end_idx, high, low, close, open)
     """
@@ -259,42 +554,24 @@ def imbalance_bar(data,ET_window,P_window, warm_up_len = 100,mode="TIB"):
     else:
         data = _preprocess(data, need_vol=True)
 
-    N = data.shape[0]
-    b_t = _direction(data["price"])
-    if mode == "VIB":
-        b_t = np.array(b_t * data["vol"])
+    b_t = _check_b_t(b_t, data, "tick" if mode == "TIB" else "volume")
     E_T = warm_up_len
     E_theta = E_T * 0.5 # without prior knowledge it's reasonable to assume P(b_t==1) = 0.5
 
-    # length of first bar
-    t0 = np.where(abs(np.cumsum(b_t))>=E_theta)[0]
-    if len(t0) == 0:
-        raise ValueError("No such bar can be created!")
+    ET_ema = EMAEstimator(ET_window)
+    P_ema = EMAEstimator(P_window)
 
-    bar = [t0[0]+1]
-    bar_len = 0
-    current_loc = sum(bar)
-    while True:
-        E_T = _EMA(bar, ET_window)[-1]
-        P_estimate = _EMA(b_t[:current_loc], P_window)[-1]
-        E_theta = E_T * abs(P_estimate)
-
-        theta_t = abs(np.cumsum(b_t[current_loc:]))
-        increment = np.where(theta_t >= E_theta)[0] # np.where() will return a tuple
-        
-        if len(increment)==0: # if can't find any appropriate bar
-            bar.append(data.shape[0] - current_loc)
-            break  
-        if bar[bar_len] + (increment[0]+1) >= N:
-            bar.append(data.shape[0] - current_loc)
-            break
-        bar.append(increment[0]+1)# python start from 0 but we want to store the length of each bar
-        current_loc += (increment[0]+1)
-        bar_len += 1
+    # the per tick loop runs in backend.py, see _imbalance_kernel()
+    bar = _backend._call(_backend._imbalance_kernel, backend, b_t, float(E_theta),
+                         ET_ema.alpha, ET_ema.max_len, P_ema.alpha, P_ema.max_len)
+    if len(bar) == 0:
+        raise ValueError("No such bar can be created!")
+    bar = list(bar)
+    bar.append(len(data.price) - sum(bar))
     result = _bar2df(bar,data)
     return result
 
-def tick_run_bar(data, ET_window, bt1_window, warm_up_len=100):
+def tick_run_bar(data, ET_window, bt1_window, warm_up_len=100, backend=None, b_t=None):
     """
     calculate the tick run bar
     note that this function has different output with fmlr::bar_tick_imbalance()
@@ -310,48 +587,31 @@ def tick_run_bar(data, ET_window, bt1_window, warm_up_len=100):
         warm_up_len -- scalar
             how many data should we use to warm up
             default is 100
+        backend -- string
+            "python" or "numba", default is None which means backend.get_backend()
+        b_t -- 1d array
+            output of tick_rule(price), default is None which computes it from data
     @returns:
         dataframe (start_t, end_t, start_idx, end_idx, high, low, close, open)
     """
     data = _preprocess(data)
-    b_t = _direction(data["price"])
-    N = data.shape[0]
+    b_t = _check_b_t(b_t, data)
 
     # initialize E_T, P(b_t=1)
-    bar = []
-    bar_len = 0
-    P_bt1_vec = []
+    ET_ema = EMAEstimator(ET_window)
+    P_bt1_ema = EMAEstimator(bt1_window)
     E_T = warm_up_len
     E_theta = E_T * 0.5
-    
-    pos_cnt = 0
-    neg_cnt = 0
-    increment = 0
-    # start updating
-    for i in range(N):
-        if b_t[i] == 1:
-            pos_cnt += 1
-        elif b_t[i] == -1:
-            neg_cnt += 1
-        increment += 1
-
-        if max(pos_cnt,neg_cnt) >= E_theta: # max(pos_cnt,neg_cnt) is theta_t
-            # print(increment)
-            bar.append(increment) # in this scenario we sample a bar
-            bar_len += 1
-
-            P_bt1_vec.append(pos_cnt/increment)
-            pos_cnt, neg_cnt = 0, 0 # reset \sum_{bt==1} to 0
-            increment = 0
-            # recalculate E_theta
-            E_T = _EMA(bar, ET_window)[-1]
-            P_bt1 = _EMA(P_bt1_vec, bt1_window)[-1]
-            E_theta = E_T * max(P_bt1, 1 - P_bt1)
-    bar.append(data.shape[0] - sum(bar))
+
+    # the per tick loop runs in backend.py, see _tick_run_kernel()
+    bar = _backend._call(_backend._tick_run_kernel, backend, b_t, float(E_theta),
+                         ET_ema.alpha, ET_ema.max_len, P_bt1_ema.alpha, P_bt1_ema.max_len)
+    bar = list(bar)
+    bar.append(len(data.price) - sum(bar))
     result = _bar2df(bar,data)
     return result
 
-def vol_run_bar(data,ET_window,bt1_window,pos_vol_window,neg_vol_window,warm_up_len=100):
+def vol_run_bar(data,ET_window,bt1_window,pos_vol_window,neg_vol_window,warm_up_len=100,backend=None,b_t=None):
     """
     calculate the tick run bar
     use E_theta = E_T * max(E[v|b_t=1]*P_bt1, E[v|b_t=-1]*(1-P_bt1))
@@ -370,67 +630,47 @@ def vol_run_bar(data,ET_window,bt1_window,pos_vol_window,neg_vol_window,warm_up_
         warm_up_len -- scalar
             how many data should we use to warm up
             default is 100
+        backend -- string
+            "python" or "numba", default is None which means backend.get_backend()
+        b_t -- 1d array
+            output of tick_rule(price), default is None which computes it from data
     @returns:
         dataframe (start_t, end_t, start_idx, end_idx, high, low, close, open)
     """
     data = _preprocess(data, need_vol=True)
-    b_t = _direction(data["price"])
-    vol = data["vol"]
-    N = data.shape[0]
+    b_t = _check_b_t(b_t, data)
+    vol = data.vol
 
     # initialize E_T, P(b_t=1), E[v_t|b_t==1], E[v_t|b_t==-1]
     t0 = warm_up_len
     E_T = t0
 
-    P_bt1 = np.count_nonzero(b_t[:t0]==1)/t0
-    P_bt1_vec = [P_bt1]
+    ET_ema = EMAEstimator(ET_window)
+    P_bt1_ema = EMAEstimator(bt1_window)
+    pos_vol_ema = EMAEstimator(pos_vol_window)
+    neg_vol_ema = EMAEstimator(neg_vol_window)
+
+    P_bt1 = P_bt1_ema.update(np.count_nonzero(b_t[:t0]==1)/t0)
 
     pos_loc = np.where(b_t[:t0]==1)[0]
     if len(pos_loc) == 0:
-        pos_vol_vec = [0]
+        E_v_bt_pos = pos_vol_ema.update(0)
     else:
-        pos_vol_vec = [np.mean(vol[pos_loc].values)]
+        E_v_bt_pos = pos_vol_ema.update(np.mean(vol[pos_loc]))
 
     neg_loc = np.where(b_t[:t0]==1)[0]
     if len(neg_loc) == 0:
-        neg_vol_vec = [0]
+        E_v_bt_neg = neg_vol_ema.update(0)
     else:
-        neg_vol_vec = [np.mean(vol[neg_loc].values)]
-    E_theta = E_T * max(pos_vol_vec[-1]*P_bt1, neg_vol_vec[-1]*(1-P_bt1))
-    
-    bar = []
-    bar_len = 0
-    pos_vol,neg_vol = 0, 0
-    pos_cnt,neg_cnt = 0, 0
-    increment = 0
-    # start updating
-    for i in range(N):
-        if b_t[i] == 1:
-            pos_vol += vol[i]
-            pos_cnt += 1
-        elif b_t[i] == -1:
-            neg_vol += vol[i]
-            neg_cnt += 1
-        increment += 1
-
-        if max(pos_vol,neg_vol) >= E_theta: # max(pos_cnt,neg_cnt) is theta_t
-            bar.append(increment) # in this scenario we sample a bar
-            bar_len += 1
-
-            P_bt1_vec.append(pos_cnt/increment)
-            pos_vol_vec.append(pos_vol/increment)
-            neg_vol_vec.append(neg_vol/increment)
-
-            pos_cnt, neg_cnt = 0, 0 # reset \sum_{b_t==1} b_t to 0
-            pos_vol, neg_vol = 0, 0 # reset \sum_{b_t==1} v_t to 0
-            increment = 0
-            # recalculate E_theta
-            E_T = _EMA(bar, ET_window)[-1]
-            P_bt1 = _EMA(P_bt1_vec, bt1_window)[-1]
-            E_v_bt_pos = _EMA(pos_vol_vec,pos_vol_window)[-1]
-            E_v_bt_neg = _EMA(neg_vol_vec,neg_vol_window)[-1]
-            E_theta = E_T * max(E_v_bt_pos*P_bt1, E_v_bt_neg * (1 - P_bt1))
-    bar.append(data.shape[0] - sum(bar))
+        E_v_bt_neg = neg_vol_ema.update(np.mean(vol[neg_loc]))
+    E_theta = E_T * max(E_v_bt_pos*P_bt1, E_v_bt_neg*(1-P_bt1))
+
+    # the per tick loop runs in backend.py, see _vol_run_kernel()
+    bar = _backend._call(_backend._vol_run_kernel, backend, b_t, vol,
+                         float(E_theta), float(P_bt1), float(E_v_bt_pos), float(E_v_bt_neg),
+                         ET_ema.alpha, ET_ema.max_len, P_bt1_ema.alpha, P_bt1_ema.max_len,
+                         pos_vol_ema.alpha, pos_vol_ema.max_len, neg_vol_ema.alpha, neg_vol_ema.max_len)
+    bar = list(bar)
+    bar.append(len(data.price) - sum(bar))
     result = _bar2df(bar,data)
     return result
-
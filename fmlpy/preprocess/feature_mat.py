@@ -2,6 +2,8 @@ import pandas as pd
 import numpy as np
 from . import filters
 import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
 
 def _check_event_format(events):
     if not isinstance(events, pd.DataFrame):
@@ -93,11 +95,139 @@ def _get_label(price_seg, barrier, side, inclu_vertical):
 
 
 
-def meta_label(price, events, profit_take, stop_loss, inclu_vertical=False):
+def _label_events(price, start, end, upper, lower, side, inclu_vertical, max_cells=2**16):
+    """
+    same outputs as _get_label() for many events at once
+    the price segments of a group of events are gathered into one padded
+    2d window (one row per event) and the first hits are found with argmax
+    along rows; events are sorted by segment length and grouped so that each
+    window has at most max_cells elements
+    @parameters:
+    price -- 1d np.ndarray
+    start, end -- 1d np.ndarray of int
+        segment of event i is price[start[i]:end[i]+1]
+    upper, lower -- 1d np.ndarray
+        barrier[0] and barrier[1] of each event
+    side -- 1d np.ndarray, elements are 1 or -1 or 0
+    inclu_vertical -- binary
+    @returns:
+    rtn, label, label_point -- 1d np.ndarray
+        label_point is relative to start, as in _get_label()
+    """
+    N_bar = len(start)
+    length = _check_segments(start, end, side)
+    upper_hit = np.zeros(N_bar, dtype=int)
+    lower_hit = np.zeros(N_bar, dtype=int)
+
+    order = np.argsort(length, kind="mergesort")
+    i = 0
+    while i < N_bar:
+        # rows in the group have length <= length[order[j-1]]
+        n = max(1, max_cells // length[order[i]])
+        while n > 1 and n * length[order[min(i+n, N_bar)-1]] > max_cells:
+            n = max(1, max_cells // length[order[min(i+n, N_bar)-1]])
+        rows = order[i:i+n]
+        width = length[rows[-1]]
+        offset = np.arange(width)
+        valid = offset < length[rows, None]
+        price_seg = price[np.minimum(start[rows, None] + offset, len(price) - 1)]
+        rtn_vec = price_seg/price_seg[:, :1] - 1 # note that rtn_vec[:, 0] == 0
+        # argmax gives 0 when there is no hit, same as in _get_label()
+        upper_hit[rows] = np.argmax((rtn_vec >= upper[rows, None]) & valid, axis=1)
+        lower_hit[rows] = np.argmax((rtn_vec <= lower[rows, None]) & valid, axis=1)
+        i += n
+    return _resolve_hits(upper_hit, lower_hit, _hit_rtn(price, start, upper_hit), _hit_rtn(price, start, lower_hit),
+                         _hit_rtn(price, start, length - 1), length, side, inclu_vertical)
+
+
+def _check_segments(start, end, side):
+    """
+    @returns:
+    length -- 1d np.ndarray, number of prices in each segment
+    """
+    length = end - start + 1
+    if np.any(length < 1):
+        raise ValueError("start_idx should not be larger than end_idx")
+    if not np.all(np.isin(side, [-1, 0, 1])):
+        raise ValueError("side should be 1 or -1 or 0")
+    return length
+
+
+def _hit_rtn(price, start, point):
+    """
+    return at start + point, same as rtn_vec[point] in _get_label()
+    """
+    return price[start + point]/price[start] - 1
+
+
+def _resolve_hits(upper_hit, lower_hit, upper_rtn, lower_rtn, last_rtn, length, side, inclu_vertical):
+    """
+    rtn, label, label_point of each event from its first hits of the upper
+    and lower barrier, 0 meaning no hit as np.argmax() in _get_label(),
+    and the returns at these hits and at the last point
+    """
+    # initially, assign -2 to label to indicate price hit vertical barrier
+    # same branches as _get_label(), the first matching condition wins
+    no_hit = (upper_hit == 0) & (lower_hit == 0)
+    take_upper = np.where(side == 0, ~no_hit & (((upper_hit < lower_hit) & (upper_hit != 0)) | (lower_hit == 0)),
+                          (side == 1) & (upper_hit != 0))
+    take_lower = np.where(side == 0, ~no_hit & ~take_upper,
+                          (side == -1) & (lower_hit != 0))
+    rtn = np.where(take_upper, upper_rtn, np.where(take_lower, lower_rtn, last_rtn))
+    label = np.where(take_upper | take_lower, np.sign(rtn), np.where(no_hit, -2, 0)).astype(int)
+    label_point = np.where(take_upper, upper_hit, np.where(take_lower, lower_hit, length))
+    if inclu_vertical:
+        label[label == -2] = 0
+    return rtn, label, label_point
+
+
+def _label_worker(spec, lo, hi, start, end, upper, lower, side, inclu_vertical):
+    """
+    label one chunk of events with the prices price[lo:hi] in shared memory
+    """
+    name, dtype, length = spec
+    block = shared_memory.SharedMemory(name=name)
+    try:
+        price = np.ndarray((length,), dtype=dtype, buffer=block.buf)[lo:hi]
+        res = _label_events(price, start - lo, end - lo, upper, lower, side, inclu_vertical)
+        del price # the view has to be released before the block is closed
+    finally:
+        block.close()
+    return res
+
+
+def _label_parallel(price, start, end, upper, lower, side, inclu_vertical, n_jobs):
+    """
+    _label_events() over contiguous chunks of events in n_jobs processes
+    price is put in shared memory once, each worker reads only the range
+    covered by its chunk, results are concatenated in the order of events
+    """
+    price = np.ascontiguousarray(price)
+    block = shared_memory.SharedMemory(create=True, size=max(price.nbytes, 1))
+    try:
+        np.ndarray(price.shape, dtype=price.dtype, buffer=block.buf)[:] = price
+        spec = (block.name, price.dtype.str, len(price))
+        tasks = []
+        for rows in np.array_split(np.arange(len(start)), n_jobs * 4):
+            if len(rows) == 0:
+                continue
+            lo, hi = start[rows].min(), end[rows].max() + 1
+            tasks.append((spec, lo, hi, start[rows], end[rows], upper[rows], lower[rows], \
+                          side[rows], inclu_vertical))
+        with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+            res = list(pool.map(_label_worker, *zip(*tasks)))
+    finally:
+        block.close()
+        block.unlink()
+    return tuple(np.concatenate(col) for col in zip(*res))
+
+
+def meta_label(price, events, profit_take, stop_loss, inclu_vertical=False, n_jobs=1):
     """
     use tripple barrier method to label data 
     @parameters:
     prices-- 1d vector
+        pd.Series or np.ndarray, events index it by position
     events--dataframe
         start_idx: start time index of each bar
         end_idx: end time index of each bar
@@ -112,6 +242,9 @@ def meta_label(price, events, profit_take, stop_loss, inclu_vertical=False):
     inclu_vertical: binary, default is False
         inclu_vertical == True means include the labels when hit verticle barrier
         inclu_vertical == False means exclude the labels when hit verticle barrier
+    n_jobs: int, default is 1
+        number of processes, events are split into contiguous chunks and
+        each process only reads the prices its chunk covers from shared memory
     @returns:
     labelled -- dataframe
         feature_start: start point of feature bar
@@ -123,39 +256,247 @@ def meta_label(price, events, profit_take, stop_loss, inclu_vertical=False):
     if not _check_event_format(events): # check the name of columns
         raise ValueError("events should be a dataframe with columns: start_t/end_t/target_rtn/side")
 
-    N_bar = events.shape[0]
+    price = np.asarray(price)
     label_start = events["start_idx"].values
     label_end = np.minimum(events["end_idx"].values, len(price)-1)
     target_rtn = events["target_rtn"].values
     side = events["side"].values
-    label_point = np.zeros(N_bar,dtype=int)
-    label = np.zeros(N_bar,dtype=int)
-    rtn = np.zeros(N_bar)
-    for i in range(N_bar):
-        barrier = [profit_take*target_rtn[i], -stop_loss*target_rtn[i]]
-        rtn[i], label[i], tmp_point = _get_label(price[label_start[i]:(label_end[i]+1)].values,\
-                                                 barrier, side[i], inclu_vertical)
-        label_point[i] = label_start[i] + tmp_point
+    # all events are labelled together, see _label_events()
+    barrier = (profit_take*target_rtn, -stop_loss*target_rtn)
+    if n_jobs > 1 and len(label_start) > 0:
+        rtn, label, tmp_point = _label_parallel(price, label_start, label_end, *barrier,\
+                                                side, inclu_vertical, n_jobs)
+    else:
+        rtn, label, tmp_point = _label_events(price, label_start, label_end, *barrier,\
+                                              side, inclu_vertical)
+    label_point = label_start + tmp_point
+    return _labelled_frame(label_start, label_point, label, rtn, inclu_vertical)
 
+def _labelled_frame(label_start, label_point, label, rtn, inclu_vertical):
+    """
+    output dataframe of meta_label()
+    """
     # previous time point of label_start is end of previous feature bar
     feature_start = np.insert(label_start[:-1]-1,0, 0)
     feature_end = label_start-1
 
-    labelled = pd.DataFrame({"feature_start":feature_start, "feature_end":feature_end,\
-        "label_point":label_point, "label":label,"return":rtn})
+    columns = {"feature_start":feature_start, "feature_end":feature_end,\
+        "label_point":label_point, "label":label,"return":rtn}
     # if we don't need bars that hitted vertical barrier
-    # we will remove bars with label==-2
-    # else we turn bars with label==-2 to 0
+    # we will remove bars with label==-2, keeping their positions in "index"
+    # else bars with label==-2 have already been turned to 0
     if not inclu_vertical: 
-        labelled = labelled.drop(labelled[labelled["label"]==-2].index)
-        labelled = labelled.reset_index()
+        keep = label != -2
+        columns = dict([("index", np.flatnonzero(keep))] + [(k, v[keep]) for k, v in columns.items()])
+    return pd.DataFrame(columns)
+
+class BarrierIndex:
+    def __init__(self, price, events):
+        """
+        range extrema index of the price series for repeated labelling of
+        the same events with different barriers, e.g. a grid of
+        profit_take/stop_loss
+        a sparse table keeps max and min of price over every range of length
+        2^k, so the first hit of any barrier is found by binary search in
+        O(log(segment length)) per event instead of scanning the segment
+        memory is 2 * len(price) * log2(longest segment) floats
+        @parameters:
+        price -- 1d vector
+            pd.Series or np.ndarray, events index it by position
+            should be positive without np.nan, otherwise the return is not
+            monotone in price and ValueError is raised, use meta_label() instead
+        events -- dataframe
+            same as in meta_label()
+        """
+        if not _check_event_format(events): # check the name of columns
+            raise ValueError("events should be a dataframe with columns: start_t/end_t/target_rtn/side")
+        self.price = np.asarray(price)
+        if not np.all(self.price > 0): # also False for np.nan
+            raise ValueError("price should be positive without NaN, use meta_label() instead")
+        self.start = events["start_idx"].values
+        self.end = np.minimum(events["end_idx"].values, len(self.price)-1)
+        self.target_rtn = events["target_rtn"].values
+        self.side = events["side"].values
+        self.length = _check_segments(self.start, self.end, self.side)
+        # level k holds max/min of price[i:i+2^k]
+        self._max, self._min = [self.price], [self.price]
+        n_level = int(np.log2(max(self.length.max(initial=1) - 1, 1))) + 1
+        for k in range(1, n_level):
+            half = 1 << (k-1)
+            self._max.append(np.maximum(self._max[-1][:-half], self._max[-1][half:]))
+            self._min.append(np.minimum(self._min[-1][:-half], self._min[-1][half:]))
+
+    def first_hit(self, barrier, upper=True):
+        """
+        first point of each segment where the return hits the barrier
+        @parameters:
+        barrier -- scalar or 1d vector
+            barrier[0] or barrier[1] of _get_label() for each event
+        upper -- binary
+            True for the upper barrier (return >= barrier),
+            False for the lower barrier (return <= barrier)
+        @returns:
+        hit -- 1d np.ndarray of int
+            position relative to start_idx, 0 if no hit, same as np.argmax() in _get_label()
+        """
+        price, start, end = self.price, self.start, self.end
+        base = price[start]
+        # the return is monotone in price, so the segment hits the barrier
+        # iff its max (min) price does; skip blocks of 2^k prices that don't
+        table = self._max if upper else self._min
+        pos = start + 1
+        for k in range(len(table) - 1, -1, -1):
+            size = 1 << k
+            inside = pos + size - 1 <= end
+            rtn = table[k][np.where(inside, pos, 0)]/base - 1
+            hit = rtn >= barrier if upper else rtn <= barrier
+            pos = np.where(inside & ~hit, pos + size, pos)
+        rtn = price[np.minimum(pos, len(price) - 1)]/base - 1
+        hit = (pos <= end) & (rtn >= barrier if upper else rtn <= barrier)
+        rtn0 = base/base - 1
+        # a hit at the first point makes np.argmax() return 0 as well
+        first = rtn0 >= barrier if upper else rtn0 <= barrier
+        return np.where(hit & ~first, pos - start, 0)
+
+    def label(self, profit_take, stop_loss, inclu_vertical=False):
+        """
+        @returns:
+        labelled -- dataframe
+            same as meta_label(price, events, profit_take, stop_loss, inclu_vertical)
+        """
+        return self.sweep([profit_take], [stop_loss], inclu_vertical)[(profit_take, stop_loss)]
+
+    def sweep(self, profit_take, stop_loss, inclu_vertical=False):
+        """
+        label the events with every pair of profit_take and stop_loss
+        the upper hits only depend on profit_take and the lower hits only on
+        stop_loss, so a n by m grid costs n + m searches
+        @parameters:
+        profit_take -- list of doubles
+        stop_loss -- list of doubles
+        @returns:
+        result -- dict
+            (profit_take, stop_loss): output of label()
+        """
+        upper = {pt: self._hits(pt*self.target_rtn, True) for pt in profit_take}
+        lower = {sl: self._hits(-sl*self.target_rtn, False) for sl in stop_loss}
+        last_rtn = _hit_rtn(self.price, self.start, self.length - 1)
+        result = {}
+        for pt in profit_take:
+            for sl in stop_loss:
+                rtn, label, tmp_point = _resolve_hits(upper[pt][0], lower[sl][0], upper[pt][1], lower[sl][1],
+                                                      last_rtn, self.length, self.side, inclu_vertical)
+                result[(pt, sl)] = _labelled_frame(self.start, self.start + tmp_point, label, rtn, inclu_vertical)
+        return result
+
+    def _hits(self, barrier, upper):
+        hit = self.first_hit(barrier, upper)
+        return hit, _hit_rtn(self.price, self.start, hit)
+
+def _interval_reduce(ufunc, x, start, end):
+    """
+    ufunc.reduce over x[start[i]:end[i]+1] for each i with one reduceat
+    the windows may overlap, the boundaries are interleaved as
+    [start[0], end[0]+1, start[1], end[1]+1, ...] and every other output is kept
+    """
+    idx = np.empty(2 * len(start), dtype=np.int64)
+    idx[0::2] = start
+    idx[1::2] = end + 1
+    x = np.concatenate((x, x[-1:])) # end+1 == len(x) is then a valid index
+    return ufunc.reduceat(x, idx)[0::2]
+
+
+def _interval_std(x, start, end, length):
+    """
+    std (ddof=0) of each window, with the mean of each window subtracted
+    from its own elements instead of using sum(x^2) - n*mean^2
+    """
+    offsets = np.concatenate(([0], np.cumsum(length)[:-1]))
+    # positions of all windows laid one after another
+    pos = np.arange(length.sum()) - np.repeat(offsets - start, length)
+    dev = x[pos] - np.repeat(_interval_reduce(np.add, x, start, end) / length, length)
+    return np.sqrt(np.add.reduceat(dev * dev, offsets) / length)
+
+
+def _interval_apply(func, x, start, end, length, max_cells=2**20):
+    """
+    fallback for custom callables, func gets the window of each interval
+    intervals are sorted by length and gathered group by group into one padded
+    2d array, so each array has at most max_cells elements (or one row), as in
+    _label_events()
+    """
+    result = np.empty(len(start))
+    order = np.argsort(length, kind="mergesort")
+    i = 0
+    while i < len(start):
+        # rows in the group have length <= length[order[i+n-1]]
+        n = max(1, max_cells // max(1, length[order[i]]))
+        while n > 1 and n * length[order[min(i+n, len(start))-1]] > max_cells:
+            n = max(1, max_cells // max(1, length[order[min(i+n, len(start))-1]]))
+        rows = order[i:i+n]
+        width = length[rows[-1]]
+        windows = x[np.minimum(start[rows, None] + np.arange(width), len(x) - 1)]
+        result[rows] = [func(window[:l]) for window, l in zip(windows, length[rows])]
+        i += n
+    return result
+
+
+def _interval_feature(features, start, end, func, vol=None):
+    """
+    value of a feature over each interval [start, end]
+    @parameters:
+    features -- 1d np.ndarray
+    start, end -- 1d np.ndarray of int
+    func -- None, string or callable
+        see add_features()
+    vol -- 1d np.ndarray, needed if func == "vwap"
+    @returns:
+    new_feature -- 1d np.ndarray
+    """
+    if func is None:
+        return features[end]
+    func = _REDUCER_ALIAS.get(func, func) if not isinstance(func, str) else func
+    if func == "last":
+        return features[end]
+    length = end - start + 1
+    empty = length < 1
+    if np.any(empty): # empty interval gives np.nan, reduce over a dummy window
+        start, end, length = np.where(empty, 0, start), np.where(empty, 0, end), np.maximum(length, 1)
+
+    x = np.asarray(features, dtype=np.float64)
+    if func == "max":
+        res = _interval_reduce(np.maximum, x, start, end)
+    elif func == "min":
+        res = _interval_reduce(np.minimum, x, start, end)
+    elif func == "sum":
+        res = _interval_reduce(np.add, x, start, end)
+    elif func == "mean":
+        res = _interval_reduce(np.add, x, start, end) / length
+    elif func == "std":
+        res = _interval_std(x, start, end, length)
+    elif func == "vwap":
+        if vol is None:
+            raise ValueError("volume data is required")
+        vol = np.asarray(vol, dtype=np.float64)
+        res = _interval_reduce(np.add, x * vol, start, end) / _interval_reduce(np.add, vol, start, end)
+    elif callable(func):
+        res = _interval_apply(func, x, start, end, length)
     else:
-        labelled[labelled["label"]==-2] = 0
-    return labelled
+        raise ValueError("func should be a callable or one of: " + "/".join(REDUCERS))
+    return np.where(empty, np.nan, res)
+
 
-def add_features(feature_mat, features, feature_name=None, func=None):
+REDUCERS = ["max", "min", "mean", "sum", "std", "last", "vwap"]
+# python/numpy reductions computed by the built-in reducers
+_REDUCER_ALIAS = {max: "max", min: "min", sum: "sum", np.max: "max", np.min: "min",
+                  np.sum: "sum", np.mean: "mean", np.std: "std"}
+
+
+def add_features(feature_mat, features, feature_name=None, func=None, vol=None, dtype=None):
     """
     add feature series generated by price/vwap/vol etc. to feature matrix
+    all new columns are written into one 2d block and joined to feature_mat
+    at once, so adding hundreds of features costs one allocation
     @parameters:
     feature_mat -- dataframe
         basically output of meta_label() function
@@ -164,30 +505,288 @@ def add_features(feature_mat, features, feature_name=None, func=None):
         label_point: time when prices hit the barrier
         label: 1(hit upper barrier) or -1(hit lower barrier) or 0(hit vertical barrier and is_vertical==False)
         return: actual return
-    features -- np.ndarray
+    features -- np.ndarray or dict
         could be 1d vector, which means only add one feature to the feature matrix
-        also could be n by 1 matrix, with each column as a feature
+        also could be n by k matrix, with each column as a feature
+        or a dict of name: 1d vector
         length of each feature should be same as raw price series
-    feature_name -- list of strings
+    feature_name -- string or list of strings
         each element corresponding to the name of one feature
-        len(feature_name) == features.shape[1]
+        len(feature_name) == features.shape[1], not used for a dict
         default is None, just give "feature1","feature2",... to each feature
+    func -- None, string or callable
+        how to summarize the feature over [feature_start, feature_end] of each row
+        None or "last" takes the value at feature_end
+        "max"/"min"/"mean"/"sum"/"std"/"vwap" are computed for all rows at once
+        with np.ufunc.reduceat, max/min/sum/np.max/np.min/np.sum/np.mean/np.std
+        are mapped to them
+        other callables are called with the window of each row, e.g. np.median
+    vol -- np.ndarray
+        volume with same length as features, needed if func == "vwap"
+        which gives sum(features * vol) / sum(vol) over each window
+    dtype -- numpy dtype
+        dtype of the new columns, e.g. np.float32 to halve the memory of a
+        wide matrix, default is None which keeps the dtype of features for
+        None/"last" and uses float64 otherwise
     @returns:
     feature_mat -- dataframe
-        just the feature_mat in input added more columns 
+        the feature_mat in input with more columns, the input is not modified
+        columns with the same names are replaced
     """
-    if not func:
-        new_feature = features[feature_mat["feature_end"]]
+    names, columns = _feature_columns(features, feature_name, feature_mat.shape[1])
+    if dtype is None:
+        last = func is None or (isinstance(func, str) and func == "last")
+        dtype = np.result_type(*columns) if last else np.float64
 
-    else:
-        new_feature = [func(features[start],features[end]) for start, end in zip(feature_mat["feature_start"], feature_mat["feature_end"])]
+    start = feature_mat["feature_start"].values
+    end = feature_mat["feature_end"].values
+    # Fortran order keeps each column contiguous, which is also how the
+    # dataframe stores a 2d block, so it is used without copy
+    block = np.empty((feature_mat.shape[0], len(columns)), dtype=dtype, order="F")
+    for j, column in enumerate(columns):
+        block[:, j] = _interval_feature(column, start, end, func, vol)
+    new_features = pd.DataFrame(block, index=feature_mat.index, columns=names, copy=False)
+    feature_mat = feature_mat.drop(columns=[name for name in names if name in feature_mat.columns])
+    return pd.concat([feature_mat, new_features], axis=1)
 
+
+def _feature_columns(features, feature_name, n_column):
+    """
+    @returns:
+    names -- list of strings
+    columns -- list of 1d np.ndarray
+    """
+    if isinstance(features, dict):
+        return list(features.keys()), [np.asarray(f) for f in features.values()]
+    features = np.asarray(features)
+    columns = [features] if features.ndim == 1 else [features[:, j] for j in range(features.shape[1])]
     if not feature_name:
-        feature_name = "feature" + str(feature_mat.shape[1]-5)
+        feature_name = ["feature" + str(n_column - 5 + j) for j in range(len(columns))]
+    elif isinstance(feature_name, str):
+        feature_name = [feature_name]
+    if len(feature_name) != len(columns):
+        raise ValueError("len(feature_name) should be same as number of features")
+    return list(feature_name), columns
+
 
-    feature_mat[feature_name] = new_feature
+def _ewm_filter(x, beta, y0):
+    """
+    y[t] = beta*y[t-1] + x[t] with y[-1] = y0 for each column of 2d x
+    solved in closed form y[t] = beta^t * (beta*y0 + sum_{i<=t} beta^-i * x[i])
+    block by block, the blocks are short enough that beta^-i stays finite
+    """
+    if beta == 0:
+        return x.copy()
+    log_beta = np.log(beta)
+    block = len(x) if log_beta == 0 else max(1, int(300 / -log_beta))
+    step = np.arange(min(block, len(x)))[:, None] * log_beta
+    grow, shrink = np.exp(step), np.exp(-step) # same for every block
+    y = np.empty_like(x)
+    for i in range(0, len(x), block):
+        rows = slice(i, min(i + block, len(x)))
+        m = rows.stop - i
+        y[rows] = grow[:m] * (beta * y0 + np.cumsum(x[rows] * shrink[:m], axis=0))
+        y0 = y[rows.stop - 1]
+    return y
 
-    # fill NA with previous value
-    feature_mat.fillna(method="ffill")
-    return feature_mat
 
+def _ewm_std(rtn, alpha, state):
+    """
+    EWM std of rtn, same as pd.Series.ewm(alpha=alpha).std(), continued from state
+    @parameters:
+    rtn -- 1d np.ndarray without np.nan
+    state -- tuple (n, sum of w*x, sum of w*x^2)
+        n is the number of returns seen before rtn, the weights w of the
+        returns decay by 1-alpha for each new return
+    @returns:
+    std -- 1d np.ndarray
+    state -- tuple, to be passed to the next call
+    """
+    n, sx, sxx = state
+    if len(rtn) == 0:
+        return np.zeros(0), state
+    beta = 1 - alpha
+    x = np.empty((len(rtn), 2), order="F") # columns stay contiguous
+    x[:, 0] = rtn
+    np.multiply(rtn, rtn, out=x[:, 1])
+    sums = _ewm_filter(x, beta, np.array([sx, sxx]))
+    # sum of w and sum of w^2 only depend on the number of returns, beta^count
+    # is only computed until it underflows
+    power = np.zeros(len(rtn))
+    if beta > 0:
+        n_power = min(len(rtn), max(0, int(750 / -np.log(beta)) - n)) if beta < 1 else len(rtn)
+        power[:n_power] = np.exp(np.log(beta) * np.arange(n + 1, n + 1 + n_power))
+    sw = (1 - power) / alpha
+    sw2 = (1 - power * power) / (1 - beta * beta)
+    mean = sums[:, 0] / sw
+    var = sums[:, 1] / sw - mean * mean
+    np.maximum(var, 0, out=var)
+    sw *= sw
+    with np.errstate(divide="ignore", invalid="ignore"):
+        var *= sw / (sw - sw2)
+    if n == 0:
+        var[0] = np.nan # std of one return
+    return np.sqrt(var), (n + len(rtn), sums[-1, 0], sums[-1, 1])
+
+
+def _time_values(time):
+    """
+    time as np.ndarray, strings are parsed as datetime64
+    """
+    time = np.asarray(time)
+    if time.dtype.kind in "OUS":
+        time = pd.to_datetime(time).values
+    return time
+
+
+def _time_delta(time, delta, name):
+    """
+    delta in the unit of time, e.g. "1D" or pd.Timedelta for datetime64 time
+    a bare number with datetime64 time raises ValueError, pd.Timedelta would
+    read it as nanoseconds
+    """
+    if time.dtype.kind == "M":
+        if isinstance(delta, (int, float, np.integer, np.floating)):
+            raise ValueError("%s should be a time delta like \"1s\" or pd.Timedelta with datetime time" % name)
+        return pd.Timedelta(delta).to_timedelta64()
+    return delta
+
+
+def ewm_volatility(price, span=100, lag=None, time=None):
+    """
+    EWM std of returns, e.g. the daily volatility used as target_rtn of meta_label()
+    return at t is price[t] / price[t-lag] - 1, or if time is given
+    price[t] / (last price before time[t] - lag) - 1
+    @parameters:
+    price -- 1d vector
+        tick or bar price
+    span -- scalar
+        span of EWM, alpha = 2 / (span + 1)
+    lag -- int or time delta
+        number of observations if time is None, default is None which means 1
+        required if time is given, a time delta like "1D" or pd.Timedelta for
+        datetime time, or a number for numeric time
+    time -- 1d vector
+        time of each price, default is None
+    @returns:
+    vol -- 1d np.ndarray
+        same length with price, np.nan where fewer than two returns are known
+    """
+    price = np.asarray(price, dtype=np.float64)
+    vol = np.full(len(price), np.nan)
+    if time is None:
+        lag = 1 if lag is None else lag
+        vol[lag:], _ = _ewm_std(price[lag:] / price[:-lag] - 1, 2 / (span + 1), (0, 0.0, 0.0))
+    else:
+        if lag is None:
+            raise ValueError("lag is required if time is given")
+        time = _time_values(time)
+        prev = np.searchsorted(time, time - _time_delta(time, lag, "lag")) - 1
+        pos = np.nonzero(prev >= 0)[0]
+        vol[pos], _ = _ewm_std(price[pos] / price[prev[pos]] - 1, 2 / (span + 1), (0, 0.0, 0.0))
+    return vol
+
+
+class EWMVolatilityStream:
+    def __init__(self, span=100, lag=1):
+        """
+        streaming version of ewm_volatility() without time
+        the last lag prices and the EWM sums are kept between updates, so the
+        outputs are the same as ewm_volatility() on the concatenated prices
+        @parameters:
+        span -- scalar
+            span of EWM, alpha = 2 / (span + 1)
+        lag -- int
+            number of observations of each return
+        """
+        self.alpha = 2 / (span + 1)
+        self.lag = lag
+        self.n = 0 # number of prices seen
+        self._state = (0, 0.0, 0.0)
+        self._last_price = np.zeros(0)
+
+    def update(self, price):
+        """
+        @parameters:
+        price -- scalar or 1d vector
+            next price or next chunk of prices
+        @returns:
+        vol -- scalar if price is a scalar, otherwise 1d np.ndarray
+            volatility after each new price
+        """
+        scalar = np.ndim(price) == 0
+        price = np.atleast_1d(np.asarray(price, dtype=np.float64))
+        prices = np.concatenate((self._last_price, price))
+        vol = np.full(len(price), np.nan)
+        n_skip = max(0, self.lag - len(self._last_price)) # prices without a return
+        if len(price) > n_skip:
+            rtn = prices[self.lag:] / prices[:-self.lag] - 1
+            vol[n_skip:], self._state = _ewm_std(rtn[-(len(price) - n_skip):], self.alpha, self._state)
+        self._last_price = prices[-self.lag:]
+        self.n += len(price)
+        return vol[0] if scalar else vol
+
+
+def vertical_barrier(idx, hold, time=None):
+    """
+    end_idx of events starting at idx
+    @parameters:
+    idx -- 1d vector of int
+        index of events, e.g. CUMSUM_filter() output
+    hold -- int or time delta
+        number of observations if time is None, otherwise a time delta
+        like "1D" or pd.Timedelta for datetime time (a bare number raises
+        ValueError), or a number for numeric time
+    time -- 1d vector
+        time of each price, default is None
+    @returns:
+    end_idx -- 1d np.ndarray
+        index of the first price at least hold after each event, may be
+        len(price) if there is no such price, meta_label() clips it
+    """
+    idx = np.asarray(idx, dtype=np.int64)
+    if time is None:
+        return idx + hold
+    time = _time_values(time)
+    return np.searchsorted(time, time[idx] + _time_delta(time, hold, "hold")).astype(np.int64)
+
+
+def get_events(price, thres, hold, time=None, span=100, lag=None, side=0, min_rtn=0.0, backend=None):
+    """
+    events dataframe of meta_label() in one call
+    events are sampled by CUMSUM_filter(), target_rtn is ewm_volatility() at
+    each event and end_idx is vertical_barrier(), all computed for all events at once
+    @parameters:
+    price -- 1d vector
+    thres -- scalar or vector
+        threshold of CUMSUM_filter()
+    hold -- int or time delta
+        holding period of vertical barrier, see vertical_barrier()
+    time -- 1d vector
+        time of each price, default is None which means lag and hold count prices
+    span -- scalar
+        span of EWM volatility, see ewm_volatility()
+    lag -- int or time delta
+        lag of the returns of volatility, required if time is given, see ewm_volatility()
+    side -- scalar or vector
+        side of all events, or side of each price with same length with price
+    min_rtn -- scalar
+        events with target_rtn <= min_rtn or without volatility are dropped
+    backend -- string
+        backend of CUMSUM_filter()
+    @returns:
+    events -- dataframe
+        start_idx: CUMSUM event + 1, label starts after the signal
+        end_idx: vertical barrier, at most len(price)-1
+        target_rtn: volatility at the CUMSUM event
+        side: side of each event
+    """
+    price = np.asarray(price, dtype=np.float64)
+    idx = filters.CUMSUM_filter(price, thres, backend=backend)
+    target_rtn = ewm_volatility(price, span, lag, time)[idx]
+    keep = (target_rtn > min_rtn) & (idx < len(price) - 1)
+    idx, target_rtn = idx[keep], target_rtn[keep]
+    end_idx = np.minimum(vertical_barrier(idx, hold, time), len(price) - 1)
+    side = np.full(len(idx), side) if np.ndim(side) == 0 else np.asarray(side)[idx]
+    return pd.DataFrame({"start_idx": idx + 1, "end_idx": end_idx,
+                         "target_rtn": target_rtn, "side": side})
@@ -1,7 +1,19 @@
 import pandas as pd 
 import numpy as np 
+from . import backend as _backend
 
-def CUMSUM_filter(price, thres):
+def _thres_vector(thres, n):
+    """
+    threshold of each of n observations as a float64 array
+    """
+    thres = np.asarray(thres, dtype=np.float64)
+    if thres.ndim == 0:
+        return np.full(n, thres)
+    if len(thres) != n:
+        raise ValueError("thres should be a scalar or have same length with price")
+    return np.ascontiguousarray(thres)
+
+def CUMSUM_filter(price, thres, backend=None):
     """
     S_+(t) = max{0, S_+(t-1) + y(t) - y(t-1)}
     S_-(t) = min{0, S_-(t-1) + y(t) - y(t-1)}
@@ -10,23 +22,149 @@ def CUMSUM_filter(price, thres):
 
     @parameters:
     price -- 1d vector(list or np.ndarray)
-    thres -- integer or vector
-        thres is a vector means different threshold at different stages is allowed
+    thres -- scalar or vector
+        thres is a vector means different threshold at different stages is allowed,
+        e.g. a rolling volatility, thres[t] is compared with S(t) and it should
+        have same length with price
+    backend -- string
+        "python" or "numba", default is None which means backend.get_backend()
+        "numba" filters millions of prices in a few milliseconds
     @returns:
-    CUMSUM_idx -- 1d vector
+    CUMSUM_idx -- 1d np.ndarray
         each element is the starting index of each bar
     """
-    CUMSUM_idx = []
-    price_diff = np.diff(price)
-    S_pos, S_neg = 0, 0 
-    for i in range(1,len(price)):
-        S_pos = max(0, S_pos + price_diff[i-1])
-        S_neg = min(0, S_neg + price_diff[i-1])
-        if max(S_pos, -S_neg) >= thres:
-            CUMSUM_idx.append(i)
-            S_pos, S_neg = 0, 0
-            
-    return np.array(CUMSUM_idx)
+    price = np.asarray(price, dtype=np.float64)
+    thres = _thres_vector(thres, len(price))
+    # the per tick loop runs in backend.py, see _cumsum_kernel()
+    CUMSUM_idx, _, _ = _backend._call(_backend._cumsum_kernel, backend,
+                                      np.diff(price), thres[1:], 0.0, 0.0)
+    return np.asarray(CUMSUM_idx, dtype=np.int64)
+
+class CUMSUMFilter:
+    def __init__(self, thres=None, backend=None):
+        """
+        streaming version of CUMSUM_filter()
+        prices are fed chunk by chunk through update(), S_+ and S_- are kept
+        between chunks so the events are the same as CUMSUM_filter() on
+        the concatenated prices
+        @parameters:
+        thres -- scalar
+            default threshold, can be None if every update() gives its own thres
+        backend -- string
+            "python" or "numba", default is None which means backend.get_backend()
+        """
+        self.thres = thres
+        self.backend = backend
+        self.S_pos = 0.0
+        self.S_neg = 0.0
+        self.n = 0 # number of prices seen
+        self._last_price = None
+
+    def update(self, price, thres=None):
+        """
+        @parameters:
+        price -- 1d vector(list or np.ndarray)
+            next prices of the stream
+        thres -- scalar or vector
+            threshold of these prices, default is None which means self.thres
+        @returns:
+        CUMSUM_idx -- 1d np.ndarray
+            events in this chunk, indexed from the first price of the stream
+        """
+        price = np.asarray(price, dtype=np.float64)
+        if thres is None:
+            thres = self.thres
+        if thres is None:
+            raise ValueError("thres is required")
+        if len(price) == 0:
+            return np.zeros(0, dtype=np.int64)
+        thres = _thres_vector(thres, len(price))
+        if self._last_price is None:
+            price_diff, thres, offset = np.diff(price), thres[1:], self.n
+        else:
+            price_diff, offset = np.diff(price, prepend=self._last_price), self.n - 1
+        CUMSUM_idx, self.S_pos, self.S_neg = _backend._call(_backend._cumsum_kernel, self.backend,
+                                                            price_diff, thres, self.S_pos, self.S_neg)
+        self._last_price = price[-1]
+        self.n += len(price)
+        return np.asarray(CUMSUM_idx, dtype=np.int64) + offset
 
+class CUMSUMEvents:
+    def __init__(self, symbols, thres, offsets, indices):
+        """
+        events of multi_CUMSUM_filter() in CSR layout
+        events of symbols[i] with thres[j] are indices[offsets[k]:offsets[k+1]]
+        where k = i * len(thres) + j
+        @parameters:
+        symbols -- list
+        thres -- list of scalars
+        offsets -- 1d np.ndarray of int64, length len(symbols) * len(thres) + 1
+        indices -- 1d np.ndarray of int64
+            positions within the price series of each symbol, same as CUMSUM_filter()
+        """
+        self.symbols = list(symbols)
+        self.thres = list(thres)
+        self.offsets = offsets
+        self.indices = indices
+        self._row = {s: i for i, s in enumerate(self.symbols)}
 
+    def get(self, symbol, thres):
+        """
+        @returns:
+        CUMSUM_idx -- 1d np.ndarray
+            view of the events of one symbol with one threshold
+        """
+        k = self._row[symbol] * len(self.thres) + self.thres.index(thres)
+        return self.indices[self.offsets[k]:self.offsets[k+1]]
 
+    def counts(self):
+        """
+        @returns:
+        counts -- dataframe
+            number of events, indexed by symbol with one column per threshold
+        """
+        counts = np.diff(self.offsets).reshape(len(self.symbols), len(self.thres))
+        return pd.DataFrame(counts, index=self.symbols, columns=self.thres)
+
+def multi_CUMSUM_filter(data, thres, symbol_col="symbol", price_col="price", backend=None):
+    """
+    CUMSUM_filter() of many symbols with many thresholds in one pass
+    all series are laid out in one array and filtered by a single kernel
+    call, and the events are returned in one CSR array instead of one
+    small array per (symbol, threshold)
+    @parameters:
+    data -- 2d np.ndarray or dataframe
+        2d np.ndarray or wide dataframe: each column is the price of one symbol,
+        columns of a dataframe are used as symbols
+        long format dataframe: has symbol_col and price_col, prices of each
+        symbol are taken in the order they appear
+    thres -- scalar or list of scalars
+    symbol_col -- string
+        name of symbol column of a long format dataframe, default is "symbol"
+    price_col -- string
+        name of price column of a long format dataframe, default is "price"
+    backend -- string
+        "python" or "numba", default is None which means backend.get_backend()
+    @returns:
+    events -- CUMSUMEvents
+    """
+    thres = np.atleast_1d(np.asarray(thres, dtype=np.float64))
+    if isinstance(data, pd.DataFrame) and symbol_col in data.columns:
+        # mergesort is stable, so prices of each symbol stay in order
+        data = data[[symbol_col, price_col]].sort_values(symbol_col, kind="mergesort")
+        symbols, sizes = np.unique(data[symbol_col].to_numpy(), return_counts=True)
+        symbols = symbols.tolist()
+        price = data[price_col].to_numpy(dtype=np.float64)
+    elif isinstance(data, (pd.DataFrame, np.ndarray)):
+        if data.ndim != 2:
+            raise ValueError("price matrix should be 2d")
+        symbols = data.columns.tolist() if isinstance(data, pd.DataFrame) else list(range(data.shape[1]))
+        matrix = np.asarray(data, dtype=np.float64)
+        sizes = np.full(matrix.shape[1], matrix.shape[0])
+        price = np.ascontiguousarray(matrix.T).ravel()
+    else:
+        raise TypeError("the input should be a 2d price matrix or a long format DataFrame")
+    bounds = np.concatenate(([0], np.cumsum(sizes))).astype(np.int64)
+    # the per tick loop runs in backend.py, see _cumsum_multi_kernel()
+    offsets, indices = _backend._call(_backend._cumsum_multi_kernel, backend, price, bounds, thres)
+    return CUMSUMEvents(symbols, thres.tolist(), np.asarray(offsets), np.asarray(indices))
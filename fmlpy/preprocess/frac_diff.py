@@ -1,10 +1,15 @@
 import pandas as pd
 import numpy as np
+from functools import lru_cache
+
+_DIRECT_MAX_LEN = 256 # longer weight vectors are convolved with FFT
+WEIGHT_CACHE_SIZE = 1024 # number of weight vectors kept by frac_weights()
 
 
 def frac_diff(price, d, thres=None, n_weight=None):
     '''
     This function is used to calculate fraction differenciation
+    the weighted sums are computed as one convolution, see _convolve()
     @parameters
     price -- vector
     d -- scalar
@@ -15,58 +20,335 @@ def frac_diff(price, d, thres=None, n_weight=None):
         how many weight factor we want
     @return:
     a fractionally differentiated vector with first n_weight element be np.nan
+    all np.nan if price is shorter than the weights
+    '''
+    comb = frac_weights(d, thres, n_weight)
+    price = np.asarray(price, dtype=np.float64)
+    if len(comb) > len(price) or len(price) == 0:
+        return np.full(len(price), np.nan)
+    result = _convolve(price, comb)
+    res = np.repeat(np.nan,len(comb)-1)
+    return np.concatenate((res, result), axis=None)
+
+
+def multi_frac_diff(X, d, thres=None, n_weight=None):
+    '''
+    frac_diff() of every column of X with every order in d
+    each column goes through the same dispatch as frac_diff(), see _convolve(),
+    but the orders with long weights and the same FFT length share one FFT of
+    the column, so a grid search of d over many features transforms each column
+    once per FFT length instead of once per d
+    @parameters
+    X -- 2d np.ndarray or dataframe
+        each column is one series, a 1d vector is treated as one column
+    d -- scalar or vector
+        differentiate orders
+    thres -- scalar
+        when weight less than thres stop
+    n_weight -- integer
+        how many weight factor we want
+    @return:
+    result -- 3d np.ndarray or dataframe
+        np.ndarray of shape (len(d), len(X), number of columns) if X is not a dataframe,
+        result[i, :, j] == frac_diff(X[:, j], d[i], thres, n_weight)
+        otherwise a dataframe with same index as X and (d, column) MultiIndex columns
+        all np.nan for an order whose weights are longer than X
+    '''
+    d_list = np.atleast_1d(np.asarray(d, dtype=np.float64)).tolist()
+    x = np.asarray(X, dtype=np.float64)
+    if x.ndim == 1:
+        x = x[:, None]
+    N = x.shape[0]
+    weights = [frac_weights(order, thres, n_weight) for order in d_list]
+    # orders with more weights than prices have no full window, left np.nan
+    usable = [i for i, w in enumerate(weights) if len(w) <= N]
+    direct = [i for i in usable if len(weights[i]) <= _DIRECT_MAX_LEN]
+    fft_groups = {}
+    for i in usable:
+        if len(weights[i]) > _DIRECT_MAX_LEN:
+            fft_groups.setdefault(_fft_len(N + len(weights[i]) - 1), []).append(i)
+
+    result = np.full((len(d_list),) + x.shape, np.nan)
+    for j in range(x.shape[1]):
+        column = np.ascontiguousarray(x[:, j]) # same layout as the price of frac_diff()
+        for i in direct:
+            result[i, len(weights[i])-1:, j] = _convolve(column, weights[i])
+        for group in fft_groups.values():
+            for i, conv in zip(group, _convolve_fft(column[:, None], [weights[i] for i in group])):
+                result[i, len(weights[i])-1:, j] = conv[:, 0]
+    if not isinstance(X, pd.DataFrame):
+        return result
+    columns = pd.MultiIndex.from_product([d_list, X.columns], names=["d", None])
+    return pd.DataFrame(np.concatenate(result, axis=1), index=X.index, columns=columns)
+
+
+def expanding_frac_diff(price, d, thres=None, chunksize=1048576):
+    '''
+    fractional differentiation with expanding window, i.e. the value at t
+    uses all t+1 weights w_0, ..., w_t
+    the convolution is done block by block with FFTs of 2 * chunksize points,
+    so apart from the outputs the memory used is O(chunksize) instead of
+    several arrays twice as long as price; the time grows with
+    (len(price) / chunksize)^2 FFTs, a larger chunksize is faster
+    @parameters
+    price -- vector
+    d -- scalar
+        generally between 0 and 1, as differentiate order
+    thres -- scalar
+        largest weight loss ratio accepted, values with larger ratio are np.nan
+        default is None which keeps all values
+    chunksize -- integer
+        length of each block
+    @return:
+    result -- 1d np.ndarray
+        a fractionally differentiated vector, np.nan after the first np.nan of price
+    weight_loss -- 1d np.ndarray
+        sum_{k>t} |w_k| / sum_k |w_k| for each t, the weights are taken up to len(price)
+    '''
+    x = np.asarray(price, dtype=np.float64)
+    N = len(x)
+    w = _combine_weight(N, d)
+    weight_loss = np.zeros(N)
+    if N > 1:
+        # weight_loss[t] == sum_{k>t} |w_k|, summed from the smallest weights
+        np.cumsum(np.abs(w[:0:-1]), out=weight_loss[-2::-1])
+        weight_loss /= weight_loss[0] + 1 # |w_0| == 1
+
+    nan = np.isnan(x)
+    first_nan = np.argmax(nan) if nan.any() else N
+    result = np.full(N, np.nan)
+    if first_nan > 0:
+        # remove the level of x, same as _convolve_fft()
+        level = x[:first_nan].mean()
+        result[:first_nan] = _expanding_convolve(x[:first_nan], level, w, min(chunksize, first_nan))
+        result[:first_nan] += level * np.cumsum(w[:first_nan])
+    if thres is not None:
+        result[weight_loss > thres] = np.nan
+    return result, weight_loss
+
+
+def _expanding_convolve(x, level, w, C):
+    '''
+    first len(x) elements of the convolution of x - level and w, len(w) >= len(x)
+    with blocks x_i = x[iC:(i+1)C] and w_j = w[jC:(j+1)C], block b of the
+    result is the sum of x_i * w_j over i+j == b plus the part of i+j == b-1
+    that spills over; the spectra are summed and transformed back once per
+    block, and they are recomputed rather than stored to keep memory O(C)
+    '''
+    N = len(x)
+    n_fft = _fft_len(2 * C)
+    result = np.empty(N)
+    carry = np.zeros(C)
+    for b in range(-(-N // C)):
+        spec = np.zeros(n_fft // 2 + 1, dtype=np.complex128)
+        for i in range(b + 1):
+            j = b - i
+            spec += np.fft.rfft(x[i*C:(i+1)*C] - level, n_fft) * np.fft.rfft(w[j*C:(j+1)*C], n_fft)
+        block = np.fft.irfft(spec, n_fft)
+        out = block[:C] + carry
+        carry = block[C:2*C]
+        result[b*C:(b+1)*C] = out[:N - b*C]
+    return result
+
+
+class FracDiffStream:
+    def __init__(self, d, thres=None, n_weight=None):
+        '''
+        streaming version of frac_diff()
+        keeps the last K prices (K = number of weights) in a ring buffer and
+        gives the new fractionally differentiated value(s) on each update()
+        the outputs are the same as frac_diff() on the whole history, i.e.
+        np.nan for the first K-1 prices
+        @parameters
+        d -- scalar
+            generally between 0 and 1, as differentiate order
+        thres -- scalar
+            when weight less than thres stop
+        n_weight -- integer
+            how many weight factor we want
+        '''
+        self.weights = frac_weights(d, thres, n_weight)
+        self._K = len(self.weights)
+        self._weights_rev = np.ascontiguousarray(self.weights[::-1])
+        # each price is stored twice, so the last K prices are always the
+        # contiguous slice _buf[_pos+1:_pos+1+K], from oldest to newest
+        self._buf = np.zeros(2 * self._K)
+        self._pos = self._K - 1
+        self.n = 0 # number of prices seen
+
+    def update(self, price):
+        '''
+        @parameters
+        price -- scalar or 1d vector
+            next price or next chunk of prices
+        @return:
+        value -- scalar if price is a scalar, otherwise 1d np.ndarray
+            fractionally differentiated value(s) of the new price(s)
+        '''
+        if np.ndim(price) == 0:
+            return self._update_one(float(price))
+        return self._update_chunk(np.asarray(price, dtype=np.float64))
+
+    def _window(self):
+        return self._buf[self._pos+1:self._pos+1+self._K]
+
+    def _update_one(self, price):
+        K = self._K
+        self._pos = (self._pos + 1) % K
+        self._buf[self._pos] = self._buf[self._pos + K] = price
+        self.n += 1
+        if self.n < K:
+            return np.nan
+        return float(np.dot(self._weights_rev, self._window()))
+
+    def _update_chunk(self, price):
+        # one blocked convolution over the buffered tail and the chunk
+        K = self._K
+        n_tail = min(self.n, K - 1)
+        x = np.concatenate((self._window()[K-n_tail:], price))
+        result = np.full(len(price), np.nan)
+        if len(x) >= K:
+            result[len(result) - (len(x) - K + 1):] = _convolve(x, self.weights)
+        last = x[-K:]
+        self._buf[:] = 0
+        self._buf[K-len(last):K] = last
+        self._buf[2*K-len(last):] = last
+        self._pos = K - 1
+        self.n += len(price)
+        return result
+
+
+def _convolve(x, w):
+    '''
+    "valid" part of the convolution of x and w, i.e.
+    result[j] = sum_k w[k] * x[j + len(w) - 1 - k]
+    np.convolve is used for short weight vectors and FFT for long ones
+    @parameters
+    x -- 1d np.ndarray of float64
+    w -- 1d np.ndarray of float64, len(w) <= len(x)
+    @return:
+    result -- 1d np.ndarray with len(x) - len(w) + 1 elements
+    '''
+    if len(w) <= _DIRECT_MAX_LEN:
+        return np.convolve(x, w, mode='valid')
+    return next(_convolve_fft(x[:, None], [w]))[:, 0]
+
+
+def _convolve_fft(x, weights):
+    '''
+    "valid" part of the convolution of each column of x with each weight vector
+    the columns are transformed once, one inverse FFT is done per weight vector
+    a window containing np.nan gives np.nan, same as a direct weighted sum
+    @parameters
+    x -- 2d np.ndarray of float64
+    weights -- list of 1d np.ndarray of float64, each no longer than len(x)
+    @return:
+    generator of 2d np.ndarray, one for each weight vector w,
+        with len(x) - len(w) + 1 rows
+    '''
+    N = x.shape[0]
+    nan = np.isnan(x)
+    has_nan = nan.any()
+    if has_nan:
+        x = np.where(nan, 0, x)
+        n_nan = np.cumsum(np.concatenate((np.zeros((1, x.shape[1]), dtype=np.int64), nan)), axis=0)
+    # remove the level of x so the FFT rounding error is relative to the
+    # size of the changes of x rather than to the size of x
+    level = x.mean(axis=0)
+    n_fft = _fft_len(N + max(len(w) for w in weights) - 1)
+    x_fft = np.fft.rfft(x - level, n_fft, axis=0)
+    for w in weights:
+        K = len(w)
+        result = np.fft.irfft(x_fft * np.fft.rfft(w, n_fft)[:, None], n_fft, axis=0)
+        result = result[K-1:N] + level * w.sum()
+        if has_nan:
+            result[n_nan[K:] - n_nan[:-K] > 0] = np.nan
+        yield result
+
+
+def _fft_len(n):
+    '''
+    smallest 2^a * 3^b * 5^c not less than n, pocketfft is fast on these sizes
+    '''
+    best = 1 << int(np.ceil(np.log2(n)))
+    p5 = 1
+    while p5 < best:
+        p35 = p5
+        while p35 < best:
+            m = p35 << max(0, int(np.ceil(np.log2(n / p35))))
+            best = min(best, m)
+            p35 *= 3
+        p5 *= 5
+    return best
+
+
+@lru_cache(maxsize=WEIGHT_CACHE_SIZE)
+def frac_weights(d, thres=None, n_weight=None):
+    '''
+    weights of fractional differentiation, shared by all callers
+    results are kept in a LRU cache keyed by (d, thres, n_weight), so a
+    pipeline using the same orders again and again computes them once per
+    process; frac_weights.cache_info() and frac_weights.cache_clear() are
+    available, worker processes forked after a call inherit the cache
+    @parameters
+    d -- scalar
+        generally between 0 and 1, as differentiate order
+    thres -- scalar
+        when weight less than thres stop, used if n_weight is None
+    n_weight -- integer
+        how many weight factor we want
+    @return:
+    weights -- 1d np.ndarray of float64
+        read only, the first element is 1
     '''
     if n_weight is not None:
-        comb = _combine_weight(n_weight, d)
+        weights = _combine_weight(n_weight, d)
+    elif thres is not None:
+        weights = _combine_threshold(d, thres)
     else:
-        comb = _combine_threshold(d, thres)
-    length = len(comb) if len(comb)<len(price) else len(price)
-    delta = len(price) - length + 1
-    df = pd.DataFrame(columns=range(len(comb)))
+        raise ValueError("either thres or n_weight is required")
+    weights.setflags(write=False)
+    return weights
 
-    for i in range(length):
-        df[i] = price[i:i+delta].values
 
-    df = df.T
-    result = df.apply(func=_one_frac, comb_list=comb, axis=0).to_list()
-    res = np.repeat(np.nan,length-1)
-    return np.concatenate((res, result), axis=None)
+def _weight_ratio(d, start, stop):
+    '''
+    w_i / w_{i-1} for i in [start, stop)
+    '''
+    i = np.arange(start, stop)
+    return (d - i + 1) / i * -1
 
 
 def _combine_weight(n_weight,d):
     '''
     calculate combination number
+    w_i = w_{i-1} * -(d - i + 1) / i is a cumulative product of the ratios
     :param n:
-    :return: a list of combination number
+    :return: np.ndarray of combination number
     '''
-    result = [None] * (n_weight)
-    sign = -1
-    result[0] = 1
-    for i in range(1, n_weight):
-        result[i] = (d - i + 1) / i * result[i - 1] * sign
-    return result
+    return np.cumprod(np.concatenate(([1.0], _weight_ratio(d, 1, n_weight))))[:n_weight]
 
 
 def _combine_threshold(d, threshold):
     '''
     calculate combination number
+    the weights are generated in blocks of doubling size until one of them
+    is not greater than threshold
     :param d:
-    :return: a list of combination number
+    :return: np.ndarray of combination number
     '''
-    result = []
-    sign = -1
-    result.append(1)
-    i = 1
+    if not threshold > 0:
+        raise ValueError("thres should be positive")
+    result = [np.ones(1)]
+    i, block = 1, 64
     while True:
-        number = (d - i + 1) / i * result[-1] * sign
-        if abs(number) > threshold:
-            result.append(number)
-            i+=1
-        else:
+        # start the product from the last weight so it is the same as one long cumprod
+        number = np.cumprod(np.concatenate((result[-1][-1:], _weight_ratio(d, i, i + block))))[1:]
+        stop = np.flatnonzero(~(np.abs(number) > threshold))
+        if len(stop) > 0:
+            result.append(number[:stop[0]])
             break
-    return result
-
-
-def _one_frac(x, comb_list):
-    answer = [a * b for a, b in zip(x[::-1], comb_list)]
-    return np.sum(answer)
+        result.append(number)
+        i += block
+        block *= 2
+    return np.concatenate(result)
@@ -7,6 +7,7 @@ setup(
     license='LICENSE',
     description='package for Financial Machine Learning',
     install_requires=['numpy','pandas'],
+    extras_require={'numba': ['numba'], 'parquet': ['pyarrow']},
     url='https://github.com/crazywiden/fmlpy',
     author='Xiuyu & Yuan',
     author_email='yuangao719@gmail.com',
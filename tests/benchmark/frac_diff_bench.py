@@ -0,0 +1,40 @@
+import sys
+import os
+import time
+import tracemalloc
+from os.path import dirname
+sys.path.append(dirname(dirname(dirname(os.getcwd()))))
+from fmlpy.preprocess.frac_diff import frac_diff
+import argparse
+import numpy as np
+
+def parser_args():
+    descrip = "fractional differentiation scaling benchmark"
+    parser = argparse.ArgumentParser(description=descrip)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000], \
+        help="length of each series")
+    parser.add_argument("--thres", type=float, nargs="+", default=[1e-3, 1e-4, 1e-5], \
+        help="when to stop for smallest weights")
+    parser.add_argument("--d", type=float, default=0.5, \
+        help="fraction difference order")
+    parser.add_argument("--seed", type=int, default=42)
+    return parser.parse_args()
+
+def main():
+    args = parser_args()
+    rng = np.random.RandomState(args.seed)
+    print("%10s %8s %8s %10s %12s" % ("N", "thres", "weights", "seconds", "peak MB"))
+    for N in args.sizes:
+        price = 2238200 + 100 * np.cumsum(rng.choice([-1, 0, 1], size=N, p=[0.3, 0.4, 0.3]))
+        for thres in args.thres:
+            tracemalloc.start()
+            start = time.perf_counter()
+            res = frac_diff(price, d=args.d, thres=thres)
+            elapsed = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            n_weight = np.count_nonzero(np.isnan(res)) + 1
+            print("%10d %8.0e %8d %10.3f %12.1f" % (N, thres, n_weight, elapsed, peak / 2**20))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+import sys
+import os
+import time
+from os.path import dirname
+sys.path.append(dirname(dirname(dirname(os.getcwd()))))
+from fmlpy.preprocess import bars
+import argparse
+import pandas as pd
+import numpy as np
+
+def parser_args():
+    descrip = "imbalance bar scaling benchmark"
+    parser = argparse.ArgumentParser(description=descrip)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000], \
+        help="number of ticks of each run")
+    parser.add_argument("--ET_window", type=int, default=400)
+    parser.add_argument("--P_window", type=int, default=400)
+    parser.add_argument("--warm_up_len", type=int, default=200)
+    parser.add_argument("--bias", type=float, default=0.1, \
+        help="P(up tick) - P(down tick) is 2*bias, sign flips every regime ticks")
+    parser.add_argument("--regime", type=int, default=10000, \
+        help="number of ticks of each buy or sell regime")
+    parser.add_argument("--max_lot", type=int, default=5, \
+        help="volume of each tick is 1 to max_lot lots")
+    parser.add_argument("--backend", type=str, default=None, \
+        help="python/numba, default is backend.get_backend()")
+    parser.add_argument("--seed", type=int, default=42)
+    return parser.parse_args()
+
+def gen_ticks(N, seed, bias, regime, max_lot):
+    """
+    random walk tick data with columns time, price, vol
+    the order flow alternates between buy and sell regimes, which gives bars of
+    a few hundred ticks; with bias == 0 the walk is symmetric, E[b_t] is close
+    to 0, the imbalance threshold E_T*|2P-1| collapses and most bars are a few
+    ticks long, the worst case for the per bar overhead
+    volume is in lots because the first VIB threshold is warm_up_len/2 in volume
+    """
+    rng = np.random.RandomState(seed)
+    up = 0.3 + bias * np.where((np.arange(N) // regime) % 2 == 0, 1, -1)
+    u = rng.random_sample(N)
+    step = np.where(u < up, 1, np.where(u < 0.6, -1, 0)) # P(no change) = 0.4
+    price = 2238200 + 100 * np.cumsum(step)
+    vol = rng.randint(1, max_lot + 1, size=N)
+    t = pd.Timestamp("2012-06-21 09:30:00") + pd.to_timedelta(np.arange(N) * 10, unit="ms")
+    return pd.DataFrame({"time": t, "price": price, "vol": vol})
+
+def main():
+    args = parser_args()
+    print("%10s %10s %6s %10s %12s %8s %10s %12s" % ("ticks", "walk", "mode", "seconds", "ticks/s", "bars",
+                                                      "bars/s", "median len"))
+    for N in args.sizes:
+        for walk, bias in [("regime", args.bias), ("symmetric", 0.0)]:
+            data = gen_ticks(N, args.seed, bias, args.regime, args.max_lot)
+            for mode in ["TIB", "VIB"]:
+                start = time.perf_counter()
+                res = bars.imbalance_bar(data, args.ET_window, args.P_window, args.warm_up_len, mode=mode,
+                                         backend=args.backend)
+                elapsed = time.perf_counter() - start
+                length = np.median(np.diff(np.append(res["start_idx"].values, N)))
+                print("%10d %10s %6s %10.3f %12.0f %8d %10.0f %12.0f" % (N, walk, mode, elapsed, N / elapsed,
+                                                                      res.shape[0], res.shape[0] / elapsed,
+                                                                      length))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+import sys
+import os
+import time
+from os.path import dirname
+sys.path.append(dirname(dirname(dirname(os.getcwd()))))
+from fmlpy.preprocess import feature_mat
+import argparse
+import pandas as pd
+import numpy as np
+
+def parser_args():
+    descrip = "meta_label scaling benchmark over number of processes"
+    parser = argparse.ArgumentParser(description=descrip)
+    parser.add_argument("--N", type=int, default=5000000, \
+        help="number of ticks")
+    parser.add_argument("--n_events", type=int, default=500000, \
+        help="number of events")
+    parser.add_argument("--hold", type=int, default=500, \
+        help="maximum holding time")
+    parser.add_argument("--n_jobs", type=int, nargs="+", default=[1, 2, 4, 8], \
+        help="number of processes of each run")
+    parser.add_argument("--seed", type=int, default=42)
+    return parser.parse_args()
+
+def gen_events(N, n_events, hold, seed):
+    """
+    random walk prices and randomly placed events
+    """
+    rng = np.random.RandomState(seed)
+    price = 2238200 + 100 * np.cumsum(rng.choice([-1, 0, 1], size=N, p=[0.3, 0.4, 0.3]))
+    start = np.sort(rng.choice(N - 1, size=n_events, replace=False)) + 1
+    events = pd.DataFrame({"start_idx": start, "end_idx": start + rng.randint(1, hold, size=n_events), \
+        "target_rtn": np.repeat(0.0005, n_events), "side": rng.choice([-1, 0, 1], size=n_events)})
+    return price, events
+
+def main():
+    args = parser_args()
+    price, events = gen_events(args.N, args.n_events, args.hold, args.seed)
+    print("%8s %10s %10s %10s" % ("n_jobs", "seconds", "speedup", "labels"))
+    base = None
+    for n_jobs in args.n_jobs:
+        start = time.perf_counter()
+        res = feature_mat.meta_label(price, events, 1, 1, n_jobs=n_jobs)
+        elapsed = time.perf_counter() - start
+        base = elapsed if base is None else base
+        print("%8d %10.3f %10.2f %10d" % (n_jobs, elapsed, base / elapsed, res.shape[0]))
+
+if __name__ == '__main__':
+    main()
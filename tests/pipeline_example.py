@@ -42,6 +42,9 @@ events["start_idx"] = t_bars["start_idx"]
 events["end_idx"] = t_bars["end_idx"]
 events["target_rtn"] = 0.001
 events["side"] = 0
+# or sample events with CUMSUM filter, using EWM volatility of 1s returns as target_rtn
+# and a 10s vertical barrier, all built in one call
+# events = fpre.get_events(test_data["Price"], thres=2000, hold="10s", time=test_data["Time"], lag="1s")
 price = test_data["Price"]
 
 feature_mat =  fpre.meta_label(price, events, profit_take=1, stop_loss=1, inclu_vertical=False)
@@ -55,6 +58,10 @@ feature_mat = fpre.add_features(feature_mat, price, feature_name="high", func=ma
 # if name is not defined, automatically assign name
 MA3 = test_data["Price"].rolling(window=3).mean()
 feature_mat = fpre.add_features(feature_mat, MA3.values) 
+# rolling/EWM statistics over past events can also be computed only at the sampling points
+# instead of on every tick, see ROLLING_FEATURES for the full list
+bar_feats = fpre.rolling_features(price, feature_mat["feature_end"], window=3, features=["cum_rtn", "vol", "zscore"])
+feature_mat = feature_mat.join(bar_feats)
 
 # before we proceed to cross validation, it should be note that
 # if a feature is not stationary, it is not recommend to use cross validation
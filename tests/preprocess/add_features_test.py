@@ -0,0 +1,91 @@
+import sys
+import os
+from os.path import dirname
+sys.path.append(dirname(dirname(dirname(os.getcwd()))))
+from fmlpy.preprocess import feature_mat
+import argparse
+import pandas as pd
+import numpy as np
+
+def parser_args():
+    descrip = "add_features reducers check"
+    parser = argparse.ArgumentParser(description=descrip)
+    parser.add_argument("--n_row", type=int, default=500, \
+        help="number of rows of feature matrix")
+    parser.add_argument("--max_len", type=int, default=300, \
+        help="max length of each window")
+    return parser.parse_args()
+
+def loop_feature(features, vol, start, end, func):
+    """
+    summarize features over [start, end] of each row one by one
+    """
+    res = []
+    for s, e in zip(start, end):
+        window = features[s:e+1]
+        if func == "last":
+            res.append(features[e])
+        elif len(window) == 0:
+            res.append(np.nan)
+        elif func == "vwap":
+            res.append(np.sum(window * vol[s:e+1]) / np.sum(vol[s:e+1]))
+        else:
+            res.append(func(window))
+    return np.array(res, dtype=float)
+
+def main(root_path):
+    args = parser_args()
+    data = pd.read_csv(os.path.join(root_path,"bar_test_data.csv"))
+    price = data["Price"].values.astype(float)
+    vol = data["Volume"].values.astype(float)
+    rng = np.random.default_rng(0)
+    # overlapping windows of random length, some of them are empty
+    start = rng.integers(0, len(price) - args.max_len, args.n_row)
+    end = start + rng.integers(-1, args.max_len, args.n_row)
+    mat = pd.DataFrame({"index": np.arange(args.n_row), "feature_start": start, "feature_end": end,
+                        "label_point": end, "label": 0, "return": 0.0})
+
+    checks = {"max": np.max, "min": np.min, "mean": np.mean, "sum": np.sum, "std": np.std,
+              "last": "last", "vwap": "vwap", np.median: np.median}
+    failed = []
+    for func, test_func in checks.items():
+        run_data = feature_mat.add_features(mat, price, feature_name="f", func=func, vol=vol)["f"].values
+        test_data = loop_feature(price, vol, start, end, test_func)
+        if not np.allclose(run_data, test_data, rtol=1e-10, equal_nan=True):
+            failed.append(getattr(func, "__name__", func))
+    # all columns of a matrix at once, same as one by one
+    features = np.column_stack((price, vol, price * vol))
+    run_data = feature_mat.add_features(mat, features, feature_name=["a", "b", "c"], func="mean")
+    for j, name in enumerate(["a", "b", "c"]):
+        if not np.allclose(run_data[name].values, loop_feature(features[:, j], vol, start, end, np.mean),
+                           rtol=1e-10, equal_nan=True):
+            failed.append("matrix")
+    # a dict of features gives the same columns as adding them one by one
+    run_data = feature_mat.add_features(mat, {"p": price, "v": vol}, func="max")
+    for name, feature in [("p", price), ("v", vol)]:
+        test_data = feature_mat.add_features(mat, feature, feature_name=name, func="max")[name]
+        if not run_data[name].equals(test_data):
+            failed.append("dict")
+    # float32 features stay float32 with "last", dtype= sets the dtype of reduced columns
+    price32 = price.astype(np.float32)
+    last32 = feature_mat.add_features(mat, price32, feature_name="f")["f"]
+    mean32 = feature_mat.add_features(mat, price, feature_name="f", func="mean", dtype=np.float32)["f"]
+    if last32.dtype != np.float32 or not np.array_equal(last32.values, price32[end]) \
+            or mean32.dtype != np.float32 \
+            or not np.allclose(mean32.values, loop_feature(price, vol, start, end, np.mean), rtol=1e-6, equal_nan=True):
+        failed.append("dtype")
+    if list(mat.columns) != ["index", "feature_start", "feature_end", "label_point", "label", "return"]:
+        failed.append("input_modified")
+    if not failed:
+        print("################################")
+        print("#Awesome! your code is perfect!#")
+        print("################################")
+    else:
+        print("#####################")
+        print("#Oops! bugs detected#")
+        print("#####################")
+        print("failed: " + ", ".join(failed))
+
+if __name__ == '__main__':
+    root_path = os.getcwd()
+    main(root_path)
@@ -0,0 +1,85 @@
+import sys
+import os
+from os.path import dirname
+sys.path.append(dirname(dirname(dirname(os.getcwd()))))
+from fmlpy.preprocess import bars, bar_batch
+import argparse
+import warnings
+import pandas as pd
+import numpy as np
+
+def parser_args():
+    descrip = "multi-symbol bars check"
+    parser = argparse.ArgumentParser(description=descrip)
+    parser.add_argument("--n_symbol", type=int, default=3, \
+        help="number of symbols the test data is split into")
+    parser.add_argument("--n_jobs", type=int, default=2, \
+        help="number of processes of the pooled run")
+    parser.add_argument("--size", type=int, default=10000, \
+        help="for vol bar")
+    parser.add_argument("--ET_window", type=int, default=400, \
+        help="for TRB")
+    parser.add_argument("--bt1_window", type=int, default=100, \
+        help="for TRB")
+    return parser.parse_args()
+
+def bar_compare(run_data, test_data):
+    """
+    compare if two bar dataframes are same, time columns are compared as datetime
+    """
+    if run_data.shape != test_data.shape:
+        return False
+    for col in ["start_t", "end_t"]:
+        if not np.array_equal(pd.to_datetime(run_data[col]).values, pd.to_datetime(test_data[col]).values):
+            return False
+    for col in ["start_idx","end_idx","close","high","open","low"]:
+        if not np.array_equal(run_data[col].values, test_data[col].values):
+            return False
+    return True
+
+def main(root_path):
+    args = parser_args()
+    test_data = pd.read_csv(os.path.join(root_path,"bar_test_data.csv"))
+    # interleaved symbols, every n_symbol-th tick belongs to the same symbol
+    symbol = np.array(["S%d" % i for i in range(args.n_symbol)])[np.arange(test_data.shape[0]) % args.n_symbol]
+    frames = {s: test_data[symbol == s].reset_index(drop=True) for s in np.unique(symbol)}
+    long_data = test_data.assign(symbol=symbol)[["symbol", "Time", "Price", "Volume"]]
+    kinds = {"volume": {"size": args.size},
+             "tick_run": {"ET_window": args.ET_window, "bt1_window": args.bt1_window}}
+
+    failed = []
+    for kind, kwargs in kinds.items():
+        test_bars = {s: bar_batch.BAR_FUNCTIONS[kind](frame, **kwargs) for s, frame in frames.items()}
+        for input_name, data in [("dict", frames), ("long", long_data)]:
+            for n_jobs in [1, args.n_jobs]:
+                res, timings = bar_batch.multi_symbol_bars(data, kind, n_jobs=n_jobs, **kwargs)
+                if not all(bar_compare(res.loc[s], test_bars[s]) for s in frames) \
+                        or not np.array_equal(timings["n_tick"].values, [f.shape[0] for f in frames.values()]):
+                    failed.append("%s_%s_%d" % (kind, input_name, n_jobs))
+
+    # a symbol too short for any bar fails alone, the others are still returned
+    bad_frames = dict(frames, bad=test_data.iloc[:5])
+    for n_jobs in [1, args.n_jobs]:
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter("always")
+            res, timings = bar_batch.multi_symbol_bars(bad_frames, "imbalance", n_jobs=n_jobs,
+                                                       ET_window=400, P_window=400)
+        test_bars = {s: bars.imbalance_bar(frame, 400, 400) for s, frame in frames.items()}
+        if "bad" in res.index.get_level_values("symbol") \
+                or not all(bar_compare(res.loc[s], test_bars[s]) for s in frames) \
+                or not str(timings.loc["bad", "error"]).startswith("ValueError") \
+                or not any("bad" in str(w.message) for w in caught):
+            failed.append("error_%d" % n_jobs)
+    if not failed:
+        print("################################")
+        print("#Awesome! your code is perfect!#")
+        print("################################")
+    else:
+        print("#####################")
+        print("#Oops! bugs detected#")
+        print("#####################")
+        print("failed: " + ", ".join(failed))
+
+if __name__ == '__main__':
+    root_path = os.getcwd()
+    main(root_path)
@@ -0,0 +1,62 @@
+import sys
+import os
+from os.path import dirname
+sys.path.append(dirname(dirname(dirname(os.getcwd()))))
+from fmlpy.preprocess import bar_features, filters, bars
+import argparse
+import pandas as pd
+import numpy as np
+
+def parser_args():
+    descrip = "rolling bar features check"
+    parser = argparse.ArgumentParser(description=descrip)
+    parser.add_argument("--thres", type=float, default=2000, \
+        help="threshold of CUMSUM filter, which gives the sampled bars")
+    parser.add_argument("--window", type=int, default=10, \
+        help="number of bars in each rolling window")
+    return parser.parse_args()
+
+def pandas_features(price, vol, idx, window):
+    """
+    same features computed by pandas rolling and by looping over the ticks of each window
+    """
+    close = pd.Series(price[idx])
+    rtn = np.log(close).diff()
+    res = pd.DataFrame({"rtn": rtn, "cum_rtn": rtn.rolling(window).sum(),
+                        "vol": rtn.rolling(window).std(),
+                        "zscore": (close - close.rolling(window).mean()) / close.rolling(window).std()})
+    dp = np.diff(price, prepend=price[0])
+    signed = bars.tick_rule(price, vol, mode="volume")
+    roll_spread, imbalance = np.full(len(idx), np.nan), np.full(len(idx), np.nan)
+    for k in range(window, len(idx)):
+        ticks = np.arange(idx[k-window]+1, idx[k]+1)
+        cov = np.cov(dp[ticks[ticks >= 2]], dp[ticks[ticks >= 2]-1])[0, 1]
+        roll_spread[k] = 2 * np.sqrt(max(-cov, 0))
+        imbalance[k] = abs(signed[ticks].sum()) / vol[ticks].sum()
+    res["roll_spread"] = roll_spread
+    res["imbalance"] = imbalance
+    return res
+
+def main(root_path):
+    args = parser_args()
+    data = pd.read_csv(os.path.join(root_path,"bar_test_data.csv"))
+    price = data["Price"].values.astype(float)
+    vol = data["Volume"].values.astype(float)
+    idx = filters.CUMSUM_filter(price, args.thres)
+
+    test_data = pandas_features(price, vol, idx, args.window)
+    run_data = bar_features.rolling_features(price, idx, args.window, vol=vol, features=list(test_data.columns))
+    res = all(np.allclose(run_data[col].values, test_data[col].values, rtol=1e-8, equal_nan=True)
+              for col in test_data.columns)
+    if res:
+        print("################################")
+        print("#Awesome! your code is perfect!#")
+        print("################################")
+    else:
+        print("#####################")
+        print("#Oops! bugs detected#")
+        print("#####################")
+
+if __name__ == '__main__':
+    root_path = os.getcwd()
+    main(root_path)
@@ -0,0 +1,122 @@
+import sys
+import os
+from os.path import dirname
+sys.path.append(dirname(dirname(dirname(os.getcwd()))))
+from fmlpy.preprocess import bars, bar_stream
+import argparse
+import pandas as pd
+import numpy as np
+
+def parser_args():
+    descrip = "streaming bars check"
+    parser = argparse.ArgumentParser(description=descrip)
+    parser.add_argument("--chunk", type=int, default=500, \
+        help="number of ticks fed to the builder each time")
+    parser.add_argument("--time_window", type=str, default="10s", \
+        help="for time bar")
+    parser.add_argument("--tz", type=str, default="US/Eastern", \
+        help="timezone of the timezone-aware time bars")
+    parser.add_argument("--size", type=int, default = 10000, \
+        help="for vol bar/dollar_bar")
+    parser.add_argument("--ET_window", type=int, default=400, \
+        help="for VIB/TIB/VRB/TRB")
+    parser.add_argument("--P_window", type=int, default=400, \
+        help="for VIB/TIB")
+    parser.add_argument("--warm_up_len", type=int, default=100, \
+        help="for VIB/TIB/VRB/TRB")
+    parser.add_argument("--bt1_window", type=int, default=100,\
+        help="for VRB/TRB")
+    return parser.parse_args()
+
+def stream_bars(builder, test_data, chunk):
+    """
+    feed test_data to builder chunk by chunk and collect all bars
+    """
+    res = []
+    for start in range(0, test_data.shape[0], chunk):
+        res.append(builder.update(test_data.iloc[start:start+chunk]))
+    res.append(builder.flush())
+    return pd.concat(res, ignore_index=True)
+
+def file_bars(args, test_data, root_path):
+    """
+    split test_data into two csv files and bar them with from_files()
+    """
+    half = test_data.shape[0] // 2
+    paths = [os.path.join(root_path,"stream_part1.csv"), os.path.join(root_path,"stream_part2.csv")]
+    test_data.iloc[:half].to_csv(paths[0], index=False)
+    test_data.iloc[half:].to_csv(paths[1], index=False)
+    return bar_stream.from_files(paths, "dollar", chunksize=args.chunk, bar=args.size)
+
+def bar_compare(run_data, test_data):
+    """
+    compare if two bar dataframes are same, including the dtypes
+    """
+    if run_data.shape != test_data.shape or not run_data.dtypes.equals(test_data.dtypes):
+        return False
+    for col in ["start_idx","end_idx","close","high","open","low"]:
+        if not np.array_equal(run_data[col].values, test_data[col].values):
+            return False
+    return True
+
+def main(root_path):
+    args = parser_args()
+    test_data = pd.read_csv(os.path.join(root_path,"bar_test_data.csv"))
+    # ticks 37s apart over a few US/Eastern days, across the start of daylight saving time
+    local_data = pd.DataFrame({"Time": pd.date_range("2024-03-08 05:00", periods=test_data.shape[0],
+                                                     freq="37s", tz=args.tz),
+                               "Price": test_data["Price"].values})
+    checks = {
+        "time_bar": (bar_stream.TimeBarBuilder(args.time_window), test_data,
+                     bars.time_bar(test_data, args.time_window)),
+        "time_bar_tz": (bar_stream.TimeBarBuilder("1h"), local_data,
+                        bars.time_bar(local_data, "1h")),
+        "time_bar_tz_days": (bar_stream.TimeBarBuilder("1D"), local_data,
+                             bars.time_bar(local_data, "1D")),
+        "vol_bar": (bar_stream.VolumeBarBuilder(args.size), test_data,
+                    bars.volume_bar(test_data, size=args.size)),
+        "dollar_bar": (bar_stream.DollarBarBuilder(args.size), test_data,
+                       bars.dollar_bar(test_data, bar=args.size)),
+        "TIB": (bar_stream.ImbalanceBarBuilder(args.ET_window, args.P_window, args.warm_up_len, mode="TIB"),
+                test_data,
+                bars.imbalance_bar(test_data, args.ET_window, args.P_window, args.warm_up_len, mode="TIB")),
+        # short windows, the last update closes every bar and flush() is empty
+        "TIB_short": (bar_stream.ImbalanceBarBuilder(10, 20, 50, mode="TIB"), test_data,
+                      bars.imbalance_bar(test_data, 10, 20, 50, mode="TIB")),
+        "VIB": (bar_stream.ImbalanceBarBuilder(args.ET_window, args.P_window, args.warm_up_len, mode="VIB"),
+                test_data,
+                bars.imbalance_bar(test_data, args.ET_window, args.P_window, args.warm_up_len, mode="VIB")),
+        "TRB": (bar_stream.TickRunBarBuilder(args.ET_window, args.bt1_window, args.warm_up_len), test_data,
+                bars.tick_run_bar(test_data, args.ET_window, args.bt1_window, args.warm_up_len)),
+        "VRB": (bar_stream.VolRunBarBuilder(args.ET_window, args.bt1_window, args.bt1_window,
+                                            args.bt1_window, args.warm_up_len), test_data,
+                bars.vol_run_bar(test_data, args.ET_window, args.bt1_window, args.bt1_window,
+                                 args.bt1_window, args.warm_up_len))
+    }
+    failed = [name for name, (builder, data, batch) in checks.items()
+              if not bar_compare(stream_bars(builder, data, args.chunk), batch)]
+    # time bars can't be streamed from unsorted ticks or chunks that go back in time
+    for name, chunks in [("unsorted", [test_data.iloc[::-1]]),
+                         ("back_in_time", [test_data.iloc[500:1000], test_data.iloc[:500]])]:
+        builder = bar_stream.TimeBarBuilder(args.time_window)
+        try:
+            for chunk in chunks:
+                builder.update(chunk)
+            failed.append(name)
+        except ValueError:
+            pass
+    if not bar_compare(file_bars(args, test_data, root_path), checks["dollar_bar"][2]):
+        failed.append("from_files")
+    if not failed:
+        print("################################")
+        print("#Awesome! your code is perfect!#")
+        print("################################")
+    else:
+        print("#####################")
+        print("#Oops! bugs detected#")
+        print("#####################")
+        print("failed: " + ", ".join(failed))
+
+if __name__ == '__main__':
+    root_path = os.getcwd()
+    main(root_path)
@@ -11,7 +11,7 @@ import numpy as np
 def parser_args():
     descrip = "time bars check"
     parser = argparse.ArgumentParser(description=descrip)
-    parser.add_argument("--bars", type=str, help="time_bar/vol_bar/dollar_bar/VIB/TIB/TRB/VRB")
+    parser.add_argument("--bars", type=str, help="time_bar/vol_bar/dollar_bar/multi_size/preprocess/tick_rule/VIB/TIB/TRB/VRB")
     parser.add_argument("--time_window", type=str, default="3s",\
         help="for time bar")
     parser.add_argument("--size", type=int, default = 10000, \
@@ -28,6 +28,8 @@ def parser_args():
         help="for VRB")
     parser.add_argument("--neg_vol_window",type=int,default=100,\
         help="for VRB")
+    parser.add_argument("--backend", type=str, default="python", choices=["python","numba"],\
+        help="for VRB/TRB")
     return parser.parse_args()
 
 def bar_compare(run_path, test_path):
@@ -77,6 +79,76 @@ def check_dollar_bar(args,test_data,root_path):
         os.path.join(root_path,"dollar_bar.csv"))
     return res
 
+def check_multi_size(args,test_data,root_path):
+    """
+    a list of sizes gives the same bars as one call for each size,
+    and entries which are not integers are rejected
+    """
+    sizes = [args.size // 2, args.size, args.size * 2]
+    vol_bars = bars.volume_bar(test_data,size=sizes)
+    dollar_bars = bars.dollar_bar(test_data,bar=np.array(sizes))
+    res = list(vol_bars.keys()) == sizes and list(dollar_bars.keys()) == sizes
+    for size in sizes:
+        res = res and vol_bars[size].equals(bars.volume_bar(test_data,size=size)) \
+            and dollar_bars[size].equals(bars.dollar_bar(test_data,bar=size))
+    for bad_sizes in [[args.size, 1.5], (args.size, "10000")]:
+        for func, key in [(bars.volume_bar, "size"), (bars.dollar_bar, "bar")]:
+            try:
+                func(test_data, **{key: bad_sizes})
+                res = False
+            except TypeError:
+                pass
+    return res
+
+def check_preprocess(args,test_data,root_path):
+    """
+    tuple and structured array input give the same bars as a dataframe,
+    non numeric columns are rejected and the input is never modified
+    """
+    original = test_data.copy()
+    time = pd.to_datetime(test_data["Time"]).values
+    price, vol = test_data["Price"].values, test_data["Volume"].values
+    records = np.zeros(len(price), dtype=[("Time", time.dtype), ("Price", price.dtype), ("Volume", vol.dtype)])
+    records["Time"], records["Price"], records["Volume"] = time, price, vol
+    frame = pd.DataFrame({"Time": time, "Price": price, "Volume": vol})
+    test_bars = bars.volume_bar(frame,size=args.size)
+    res = bars.volume_bar((time, price, vol),size=args.size).equals(test_bars) \
+        and bars.volume_bar(records,size=args.size).equals(test_bars) \
+        and bars.tick_run_bar((time, price),args.ET_window,args.bt1_window,args.warm_up_len).equals(
+            bars.tick_run_bar(frame,args.ET_window,args.bt1_window,args.warm_up_len))
+    bad_data = [test_data.assign(Price="a"), test_data.assign(Volume=test_data["Time"])]
+    for data in bad_data:
+        try:
+            bars.volume_bar(data,size=args.size)
+            res = False
+        except TypeError:
+            pass
+    bars.time_bar(test_data,time_window=args.time_window)
+    bars.dollar_bar(test_data,bar=args.size)
+    bars.imbalance_bar(test_data,args.ET_window,args.P_window,args.warm_up_len,mode="VIB")
+    return res and test_data.equals(original) and test_data.dtypes.equals(original.dtypes)
+
+def loop_tick_rule(price):
+    """
+    b_t one tick at a time, b_0 = 0 and a zero change repeats the previous b_t
+    """
+    b_t = [0]
+    for i in range(1, len(price)):
+        diff = price[i] - price[i-1]
+        b_t.append(b_t[-1] if diff == 0 else np.sign(diff))
+    return np.array(b_t)
+
+def check_tick_rule(args,test_data,root_path):
+    price, vol = test_data["Price"].values, test_data["Volume"].values
+    test_b_t = loop_tick_rule(price)
+    # zero changes right at the start keep b_t at 0 until the first move
+    flat_start = np.array([5, 5, 5, 6, 6, 4, 4, 4, 7])
+    return np.array_equal(bars.tick_rule(price), test_b_t) \
+        and np.array_equal(bars.tick_rule(price, vol, mode="volume"), test_b_t * vol) \
+        and np.array_equal(bars.tick_rule(price, vol, mode="dollar"), test_b_t * price * vol) \
+        and np.array_equal(bars.tick_rule(flat_start), loop_tick_rule(flat_start)) \
+        and len(bars.tick_rule(price[:0])) == 0 and np.array_equal(bars.tick_rule(price[:1]), [0])
+
 def check_TIB(args,test_data,root_path):
     ET_win = args.ET_window
     P_win = args.P_window
@@ -109,7 +181,7 @@ def check_TRB(args,test_data,root_path):
     ET_win = args.ET_window
     bt1_win = args.bt1_window
     warm_len = args.warm_up_len
-    TRB = bars.tick_run_bar(test_data,ET_win,bt1_win,warm_len)
+    TRB = bars.tick_run_bar(test_data,ET_win,bt1_win,warm_len,backend=args.backend)
     TRB.to_csv(os.path.join(root_path,"TRB_run.csv"))
     R_cmd = "Rscript gen_bars.R --bars TRB --ET_window %d --bt1_window %d --warm_up_len %d" % \
     (ET_win, bt1_win, warm_len)
@@ -124,7 +196,8 @@ def check_VRB(args,test_data,root_path):
     pos_vol_win = args.pos_vol_window
     neg_vol_win = args.neg_vol_window
     warm_up_len = args.warm_up_len
-    TRB = bars.vol_run_bar(test_data,ET_win,bt1_win,pos_vol_win,neg_vol_win,warm_up_len)
+    TRB = bars.vol_run_bar(test_data,ET_win,bt1_win,pos_vol_win,neg_vol_win,warm_up_len,\
+        backend=args.backend)
     TRB.to_csv(os.path.join(root_path,"VRB_run.csv"))
     R_cmd = ("Rscript gen_bars.R --bars VRB --ET_window %d --bt1_window %d " + \
             "--pos_vol_window %d --neg_vol_window %d --warm_up_len %d") % \
@@ -143,6 +216,12 @@ def main(root_path):
         res = check_dollar_bar(args,test_data,root_path)
     elif args.bars == "vol_bar":
         res = check_vol_bar(args,test_data,root_path)
+    elif args.bars == "multi_size":
+        res = check_multi_size(args,test_data,root_path)
+    elif args.bars == "preprocess":
+        res = check_preprocess(args,test_data,root_path)
+    elif args.bars == "tick_rule":
+        res = check_tick_rule(args,test_data,root_path)
     elif args.bars == "VIB":
         res = check_VIB(args,test_data,root_path)
     elif args.bars == "TIB":
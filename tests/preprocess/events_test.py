@@ -0,0 +1,72 @@
+import sys
+import os
+from os.path import dirname
+sys.path.append(dirname(dirname(dirname(os.getcwd()))))
+from fmlpy.preprocess import feature_mat
+import argparse
+import pandas as pd
+import numpy as np
+
+def parser_args():
+    descrip = "volatility target and events check"
+    parser = argparse.ArgumentParser(description=descrip)
+    parser.add_argument("--span", type=int, default=100, \
+        help="span of EWM volatility")
+    parser.add_argument("--lag", type=str, default="1s", \
+        help="lag of the returns of volatility")
+    parser.add_argument("--hold", type=str, default="10s", \
+        help="holding period of vertical barrier")
+    parser.add_argument("--thres", type=float, default=2000, \
+        help="threshold of CUMSUM filter")
+    parser.add_argument("--chunk", type=int, default=500, \
+        help="number of prices fed to EWMVolatilityStream each time")
+    return parser.parse_args()
+
+def main(root_path):
+    args = parser_args()
+    data = pd.read_csv(os.path.join(root_path,"bar_test_data.csv"))
+    price = data["Price"].values.astype(float)
+    time = pd.to_datetime(data["Time"]).values
+
+    # volatility of tick returns, by pandas, in one batch and streamed
+    test_vol = (pd.Series(price).pct_change().ewm(span=args.span).std()).values
+    run_vol = feature_mat.ewm_volatility(price, args.span)
+    stream = feature_mat.EWMVolatilityStream(args.span)
+    stream_vol = np.concatenate([stream.update(price[i:i+args.chunk]) \
+        for i in range(0, len(price), args.chunk)])
+    # volatility of returns over a time lag
+    prev = np.searchsorted(time, time - pd.Timedelta(args.lag).to_timedelta64()) - 1
+    pos = np.nonzero(prev >= 0)[0]
+    test_lag_vol = np.full(len(price), np.nan)
+    test_lag_vol[pos] = pd.Series(price[pos] / price[prev[pos]] - 1).ewm(span=args.span).std().values
+    run_lag_vol = feature_mat.ewm_volatility(price, args.span, lag=args.lag, time=data["Time"])
+
+    events = feature_mat.get_events(price, args.thres, args.hold, time=data["Time"], span=args.span, lag=args.lag)
+    hold = pd.Timedelta(args.hold).to_timedelta64()
+    test_end = [next((j for j in range(i, len(time)) if time[j] >= time[i-1] + hold), len(time)-1) \
+        for i in events["start_idx"].values]
+
+    # lag is required with datetime time, a default of 1 would be read as 1ns
+    try:
+        feature_mat.get_events(price, args.thres, args.hold, time=data["Time"], span=args.span)
+        int_lag_raised = False
+    except ValueError:
+        int_lag_raised = True
+
+    res = int_lag_raised and np.allclose(run_vol, test_vol, rtol=1e-10, equal_nan=True) \
+        and np.allclose(stream_vol, test_vol, rtol=1e-10, equal_nan=True) \
+        and np.allclose(run_lag_vol, test_lag_vol, rtol=1e-10, equal_nan=True) \
+        and np.array_equal(events["end_idx"].values, test_end) \
+        and np.array_equal(events["target_rtn"].values, run_lag_vol[events["start_idx"].values-1])
+    if res:
+        print("################################")
+        print("#Awesome! your code is perfect!#")
+        print("################################")
+    else:
+        print("#####################")
+        print("#Oops! bugs detected#")
+        print("#####################")
+
+if __name__ == '__main__':
+    root_path = os.getcwd()
+    main(root_path)
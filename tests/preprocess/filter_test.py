@@ -14,6 +14,10 @@ def parser_args():
     parser = argparse.ArgumentParser(description=descrip)
     parser.add_argument("--thres", type=float, default=10, \
         help="threshold of CUMSUM filter")
+    parser.add_argument("--backend", type=str, default="python", choices=["python","numba"],\
+        help="backend of the CUMSUM filter loop")
+    parser.add_argument("--chunk", type=int, default=500, \
+        help="number of prices fed to CUMSUMFilter each time")
     return parser.parse_args()
 
 def main(root_path):
@@ -22,16 +26,24 @@ def main(root_path):
     data = pd.read_csv(os.path.join(root_path,"bar_test_data.csv"))
     price = data["Price"]
     thres = args.thres
-    CUMSUM_idx = filters.CUMSUM_filter(price, thres)
+    CUMSUM_idx = filters.CUMSUM_filter(price, thres, backend=args.backend)
     np.savetxt("CUMSUM_idx.csv", CUMSUM_idx, delimiter=",")
 
+    stream = filters.CUMSUMFilter(thres, backend=args.backend)
+    CUMSUM_idx_stream = np.concatenate([stream.update(price.values[i:i+args.chunk]) \
+        for i in range(0, len(price), args.chunk)])
+    events = filters.multi_CUMSUM_filter(np.column_stack([price.values, price.values[::-1]]), \
+        [thres, 2*thres], backend=args.backend)
+    CUMSUM_idx_multi = events.get(0, thres)
+
     Rmd = "Rscript gen_filters.R --thres %f" % thres
     subprocess.check_output(Rmd, universal_newlines=True)
     CUMSUM_idx_run = pd.read_csv(os.path.join(root_path,"CUMSUM_idx_run.csv"))
     CUMSUM_idx_run = CUMSUM_idx_run["x"].values
     
     # because in python vector start from index 0, so to compare we need plus 1
-    res = np.array_equal(CUMSUM_idx+1, CUMSUM_idx_run) 
+    res = np.array_equal(CUMSUM_idx+1, CUMSUM_idx_run) and np.array_equal(CUMSUM_idx, CUMSUM_idx_stream) \
+        and np.array_equal(CUMSUM_idx, CUMSUM_idx_multi)
     if res:
         print("################################")
         print("#Awesome! your code is perfect!#")
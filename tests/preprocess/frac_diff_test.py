@@ -2,7 +2,7 @@ import sys
 import os
 from os.path import dirname
 sys.path.append(dirname(dirname(dirname(os.getcwd()))))
-from fmlpy.preprocess.frac_diff import frac_diff
+from fmlpy.preprocess.frac_diff import frac_diff, multi_frac_diff, FracDiffStream, expanding_frac_diff
 import subprocess
 import argparse
 import pandas as pd
@@ -49,6 +49,19 @@ def main(root_path):
     # the ideal return value of frac_diff() should be np.adarray
     diff_run_N = frac_diff(price, d = args.d, n_weight=args.N)
     diff_run_thres = frac_diff(price, d = args.d, thres=args.thres)
+    # batch version with the same series twice and one more order
+    diff_batch = multi_frac_diff(np.column_stack([price, price]), [args.d, args.d / 2], thres=args.thres)
+    # same dispatch as frac_diff(), so the batch values are exactly equal
+    batch_equal = np.array_equal(diff_batch[0, :, 0], diff_run_thres, equal_nan=True) \
+        and np.array_equal(diff_batch[1, :, 1], frac_diff(price, d=args.d / 2, thres=args.thres), equal_nan=True)
+    # streaming version, first half tick by tick and second half in one chunk
+    stream = FracDiffStream(args.d, n_weight=args.N)
+    half = len(price) // 2
+    diff_stream = [stream.update(p) for p in price.values[:half]]
+    diff_stream = np.concatenate((diff_stream, stream.update(price.values[half:])))
+    # expanding window, the i-th value is the fixed window value with i+1 weights
+    diff_expand, weight_loss = expanding_frac_diff(price, d = args.d, chunksize=1000)
+    diff_fixed = [frac_diff(price[:i+1], d = args.d, n_weight=i+1)[-1] for i in [0, 99, 999, len(price)-1]]
     #
     Rmd = "Rscript gen_frac_diff.R --d %f --N %d --thres %f" % (args.d, args.N, args.thres)
     subprocess.check_output(Rmd, universal_newlines=True)
@@ -65,7 +78,16 @@ def main(root_path):
     vec_thres = vec_thres[~np.isnan(vec_thres)]
 
     res_N = array_compare(diff_run_N, vec_N)
+    # fewer prices than weights leave no full window
+    short = price.values[:args.N-1]
+    res_N = res_N and np.all(np.isnan(frac_diff(short, d=args.d, n_weight=args.N))) \
+        and np.all(np.isnan(multi_frac_diff(short, [args.d], n_weight=args.N)))
     res_thres = array_compare(diff_run_thres, vec_thres)
+    diff_batch = diff_batch[0, :, 1]
+    res_batch = batch_equal and array_compare(diff_batch[~np.isnan(diff_batch)], vec_thres)
+    res_stream = array_compare(diff_stream[~np.isnan(diff_stream)], vec_N)
+    res_expand = array_compare(diff_expand[[0, 99, 999, len(price)-1]] / diff_fixed, np.ones(4)) \
+        and weight_loss[-1] == 0 and np.all(np.diff(weight_loss) <= 0)
 
     if not res_N:
         print("##########################################################")
@@ -77,7 +99,22 @@ def main(root_path):
         print("#Something wrong in the calculation of threshold of w!#")
         print("#######################################################")
 
-    if res_N and res_thres:
+    if not res_batch:
+        print("###################################################")
+        print("#Something wrong in the batch fractional difference!#")
+        print("###################################################")
+
+    if not res_stream:
+        print("#####################################################")
+        print("#Something wrong in the streaming fractional difference!#")
+        print("#####################################################")
+
+    if not res_expand:
+        print("#####################################################")
+        print("#Something wrong in the expanding fractional difference!#")
+        print("#####################################################")
+
+    if res_N and res_thres and res_batch and res_stream and res_expand:
         print("################################")
         print("#Awesome! your code is perfect!#")
         print("################################")
@@ -50,9 +50,24 @@ def main(root_path):
     # each element in CUMSUM_idx is the time point when signal appears
     # also because price is all close price, so we can only take action the next minute/day
     # so label should start from CUMSUM_idx + 1
-    events = pd.DataFrame({"start_t":CUMSUM_idx + 1, "end_t": CUMSUM_idx + hold_time,\
+    events = pd.DataFrame({"start_idx":CUMSUM_idx + 1, "end_idx": CUMSUM_idx + hold_time,\
         "target_rtn":np.repeat(target,N), "side": np.repeat(0,N)})
     meta_label = feature_mat.meta_label(price, events, profit_take, stop_loss, inclu_vertical)
+    # the barrier index should give the same labels for every point of a grid
+    grid = feature_mat.BarrierIndex(price, events).sweep([profit_take, 2*profit_take], \
+        [stop_loss, 2*stop_loss], inclu_vertical)
+    index_diff = not grid[(profit_take, stop_loss)].equals(meta_label) or \
+        not grid[(2*profit_take, stop_loss)].equals(feature_mat.meta_label(price, events, 2*profit_take, stop_loss, inclu_vertical))
+    # labelling chunks of events in worker processes gives the same frame
+    index_diff = index_diff or not feature_mat.meta_label(price, events, profit_take, stop_loss, \
+        inclu_vertical, n_jobs=2).equals(meta_label)
+    # the binary search needs positive prices without NaN, it should refuse the others
+    for bad in [np.where(np.arange(len(price)) % 50 == 0, np.nan, price), -np.asarray(price, dtype=float)]:
+        try:
+            feature_mat.BarrierIndex(bad, events)
+            index_diff = True
+        except ValueError:
+            pass
     
     Rmd = "Rscript gen_labelling.R --pt %f --sl %f --thres %d --target %f --hold %d --inclu_vertical %s"\
      % (profit_take, stop_loss, thres, target, hold_time, args.inclu_vertical)
@@ -71,7 +86,7 @@ def main(root_path):
     rtn_diff = len(np.where((meta_label["return"]-meta_label_run["ret"]>1e-9))[0])
     label_diff = len(np.where((meta_label["label"]-meta_label_run["label"])!=0)[0])
     
-    diff = [feature_start_diff,feature_end_diff,label_idx_diff,rtn_diff,label_diff]
+    diff = [feature_start_diff,feature_end_diff,label_idx_diff,rtn_diff,label_diff,index_diff]
     if not np.any(diff):
         print("################################")
         print("#Awesome! your code is perfect!#")
@@ -0,0 +1,110 @@
+import sys
+import os
+from os.path import dirname
+sys.path.append(dirname(dirname(dirname(os.getcwd()))))
+from fmlpy.preprocess import bars
+import argparse
+import pandas as pd
+import numpy as np
+
+def parser_args():
+    descrip = "time bar check"
+    parser = argparse.ArgumentParser(description=descrip)
+    parser.add_argument("--time_window", type=str, default="10s", \
+        help="fixed length time window")
+    parser.add_argument("--tz", type=str, default="US/Eastern", \
+        help="timezone of the timezone-aware check")
+    return parser.parse_args()
+
+def resample_bars(time, price, time_window, empty="drop"):
+    """
+    time bars by pandas resample, empty windows kept as flat bars if empty == "ffill"
+    """
+    frame = pd.DataFrame({"idx": np.arange(len(price)), "price": price}, index=pd.DatetimeIndex(time))
+    agg = frame.resample(time_window).agg({"idx": ["first", "last"], "price": ["min", "max", "first", "last"]})
+    agg.columns = ["start_idx", "end_idx", "low", "high", "open", "close"]
+    filled = agg["start_idx"].notna().values
+    agg["start_t"] = pd.Series(time).iloc[agg["start_idx"].fillna(0).astype(int)].values
+    agg["end_t"] = pd.Series(time).iloc[agg["end_idx"].fillna(0).astype(int)].values
+    if empty == "drop":
+        agg = agg[filled]
+    else:
+        agg["end_idx"] = agg["end_idx"].ffill()
+        agg["close"] = agg["close"].ffill()
+        window_t = agg.index.to_series().values
+        agg.loc[~filled, "start_t"] = window_t[~filled]
+        agg.loc[~filled, "end_t"] = window_t[~filled]
+        agg.loc[~filled, "start_idx"] = agg.loc[~filled, "end_idx"]
+        for col in ["low", "high", "open"]:
+            agg.loc[~filled, col] = agg.loc[~filled, "close"]
+    agg = agg.astype({"start_idx": "int64", "end_idx": "int64"}).reset_index(drop=True)
+    return agg[bars.BAR_COLUMNS]
+
+def bar_compare(run_data, test_data):
+    """
+    compare if two bar dataframes are same, including the time columns
+    int64 epoch times are compared with datetime times in microseconds
+    """
+    if run_data.shape != test_data.shape:
+        return False
+    for col in bars.BAR_COLUMNS:
+        run_col, test_col = run_data[col].values, test_data[col].values
+        if run_col.dtype.kind == "i" and test_col.dtype.kind == "M":
+            test_col = test_col.astype("datetime64[us]").view("int64")
+        if not np.array_equal(run_col, test_col):
+            return False
+    return True
+
+def main(root_path):
+    args = parser_args()
+    test_data = pd.read_csv(os.path.join(root_path,"bar_test_data.csv"))
+    time = pd.to_datetime(test_data["Time"]).values.astype("datetime64[ns]")
+    price = test_data["Price"].values
+    epoch_us = time.view("int64") // 1000
+    width_us = pd.Timedelta(args.time_window).value // 1000
+    # a gap of a few windows without any tick
+    gap_time = np.concatenate((time[:100], time[100:] + pd.Timedelta(args.time_window) * 5))
+    local_time = pd.DatetimeIndex(time).tz_localize("UTC").tz_convert(args.tz)
+    shuffle = np.random.default_rng(0).permutation(len(price))
+    # hourly prices over two days, days should be split at local midnight
+    hourly_time = pd.date_range("2024-03-08 05:00", periods=48, freq="h", tz=args.tz)
+    hourly_price = np.arange(48.0)
+
+    checks = {
+        "datetime": (bars.time_bar(test_data, args.time_window),
+                     resample_bars(time, price, args.time_window)),
+        "epoch_unit": (bars.time_bar((epoch_us, price), args.time_window, unit="us"),
+                       resample_bars(time, price, args.time_window)),
+        "epoch_int_window": (bars.time_bar((epoch_us, price), width_us),
+                             resample_bars(time, price, args.time_window)),
+        "ffill": (bars.time_bar((gap_time, price), args.time_window, empty="ffill"),
+                  resample_bars(gap_time, price, args.time_window, empty="ffill")),
+        "tz_aware": (bars.time_bar(pd.DataFrame({"t": local_time, "p": price}), "1D", empty="ffill"),
+                     resample_bars(local_time, price, "1D", empty="ffill")),
+        "tz_days": (bars.time_bar(pd.DataFrame({"t": hourly_time, "p": hourly_price}), "1D"),
+                    resample_bars(hourly_time, hourly_price, "1D")),
+        "unsorted": (bars.time_bar((time[shuffle], price[shuffle]), args.time_window),
+                     resample_bars(time[shuffle], price[shuffle], args.time_window))
+    }
+    failed = [name for name, (run_data, test_data) in checks.items()
+              if not bar_compare(run_data, test_data)]
+    # windows that are not positive once converted to the unit of the timestamps
+    for time_window, unit in [(0, "ns"), (-5, "ns"), ("500ns", "us")]:
+        try:
+            bars.time_bar((epoch_us, price), time_window, unit=unit)
+            failed.append("window_%s_%s" % (time_window, unit))
+        except ValueError:
+            pass
+    if not failed:
+        print("################################")
+        print("#Awesome! your code is perfect!#")
+        print("################################")
+    else:
+        print("#####################")
+        print("#Oops! bugs detected#")
+        print("#####################")
+        print("failed: " + ", ".join(failed))
+
+if __name__ == '__main__':
+    root_path = os.getcwd()
+    main(root_path)